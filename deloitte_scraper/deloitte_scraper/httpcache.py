@@ -0,0 +1,151 @@
+# HTTP cache storage that keeps every cached response in one SQLite file
+#
+# Enable it in settings.py with:
+# HTTPCACHE_ENABLED = True
+# HTTPCACHE_STORAGE = "deloitte_scraper.httpcache.SQLiteCacheStorage"
+#
+# See documentation in:
+# https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-storage-backends
+
+import os
+import sqlite3
+import time
+import zlib
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.project import data_path
+from w3lib.http import headers_dict_to_raw, headers_raw_to_dict
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class SQLiteCacheStorage:
+    """Compressed responses in a single SQLite file, one namespace per spider.
+
+    Bodies are zstd-compressed (zlib when zstandard is not installed).
+    HTTPCACHE_EXPIRATION_SECS drops old entries and HTTPCACHE_SQLITE_MAX_SIZE
+    caps the total size of the stored bodies, oldest entries are evicted first.
+    With HTTPCACHE_IGNORE_MISSING the cache is used as the only source of
+    responses, expired entries are still served and nothing is evicted.
+    """
+
+    def __init__(self, settings):
+        self.cachedir = data_path(settings["HTTPCACHE_DIR"], createdir=True)
+        self.path = os.path.join(self.cachedir, "httpcache.sqlite")
+        self.expiration_secs = settings.getint("HTTPCACHE_EXPIRATION_SECS")
+        self.max_size = settings.getint("HTTPCACHE_SQLITE_MAX_SIZE", 0)
+        self.compression_level = settings.getint(
+            "HTTPCACHE_SQLITE_COMPRESSION_LEVEL", 3
+        )
+        self.cache_only = settings.getbool("HTTPCACHE_IGNORE_MISSING")
+        self.connection = None
+        self.namespace = None
+        if zstandard is not None:
+            self.compressor = zstandard.ZstdCompressor(level=self.compression_level)
+            self.decompressor = zstandard.ZstdDecompressor()
+
+    def open_spider(self, spider):
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "namespace TEXT NOT NULL, fingerprint TEXT NOT NULL, url TEXT NOT NULL, "
+            "status INTEGER NOT NULL, headers BLOB NOT NULL, body BLOB NOT NULL, "
+            "codec TEXT NOT NULL, size INTEGER NOT NULL, stored_at REAL NOT NULL, "
+            "PRIMARY KEY (namespace, fingerprint))"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_stored_at "
+            "ON responses (namespace, stored_at)"
+        )
+        self.connection.commit()
+        self.namespace = getattr(spider, "httpcache_namespace", spider.name)
+        self.fingerprinter = spider.crawler.request_fingerprinter
+        if not self.cache_only:
+            self.evict_expired()
+        spider.logger.debug(
+            f"Using SQLite cache storage in {self.path}, namespace {self.namespace}"
+        )
+
+    def close_spider(self, spider):
+        if not self.cache_only:
+            self.evict_oversized()
+        self.connection.close()
+        self.connection = None
+
+    def compress(self, body):
+        if zstandard is not None:
+            return self.compressor.compress(body), "zstd"
+        return zlib.compress(body, min(self.compression_level, 9)), "zlib"
+
+    def decompress(self, body, codec):
+        if codec == "zstd":
+            if zstandard is None:
+                return None
+            return self.decompressor.decompress(body)
+        return zlib.decompress(body)
+
+    def retrieve_response(self, spider, request):
+        key = self.fingerprinter.fingerprint(request).hex()
+        row = self.connection.execute(
+            "SELECT url, status, headers, body, codec, stored_at FROM responses "
+            "WHERE namespace = ? AND fingerprint = ?",
+            (self.namespace, key),
+        ).fetchone()
+        if row is None:
+            return None  # not cached
+        url, status, raw_headers, body, codec, stored_at = row
+        if not self.cache_only and 0 < self.expiration_secs < time.time() - stored_at:
+            return None  # expired
+        body = self.decompress(body, codec)
+        if body is None:
+            return None  # written with zstandard, which is no longer installed
+        headers = Headers(headers_raw_to_dict(raw_headers))
+        respcls = responsetypes.from_args(headers=headers, url=url, body=body)
+        request.meta["cache_timestamp"] = stored_at
+        return respcls(url=url, headers=headers, status=status, body=body)
+
+    def store_response(self, spider, request, response):
+        key = self.fingerprinter.fingerprint(request).hex()
+        body, codec = self.compress(response.body)
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.namespace,
+                    key,
+                    response.url,
+                    response.status,
+                    headers_dict_to_raw(response.headers),
+                    body,
+                    codec,
+                    len(body),
+                    time.time(),
+                ),
+            )
+
+    def evict_expired(self):
+        if self.expiration_secs <= 0:
+            return
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM responses WHERE namespace = ? AND stored_at < ?",
+                (self.namespace, time.time() - self.expiration_secs),
+            )
+
+    def evict_oversized(self):
+        if self.max_size <= 0:
+            return
+        # Keep the newest entries, across all namespaces, that fit in max_size bytes
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM responses WHERE rowid IN ("
+                "SELECT rowid FROM (SELECT rowid, SUM(size) OVER "
+                "(ORDER BY stored_at DESC ROWS UNBOUNDED PRECEDING) AS total "
+                "FROM responses) WHERE total > ?)",
+                (self.max_size,),
+            )
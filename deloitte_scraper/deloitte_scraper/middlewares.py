@@ -3,8 +3,17 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import datetime
+import hashlib
+import os
 import random
+import sqlite3
+from urllib.parse import urlparse
 from scrapy import signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.utils.defer import maybe_deferred_to_future
+from twisted.internet.defer import DeferredSemaphore
+from w3lib.url import canonicalize_url
 
 # useful for handling different item types with a single interface
 from itemadapter import is_item, ItemAdapter
@@ -25,6 +34,232 @@ class RandomUserAgentMiddleware:
         spider.logger.debug(f"User-Agent: {user_agent} for {request.url}")
 
 
+# Sent with the request and response of a page skipped by ConditionalGetMiddleware,
+# SQLiteStorePipeline marks its items as seen
+page_unchanged = object()
+
+validator_store_path = os.path.join(
+    os.path.dirname(__file__), "..", "..", "data", "cache", "validators.sqlite"
+)
+
+
+class ValidatorStore:
+    """ETag, Last-Modified and body hash of every page fetched with conditional GET."""
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = None
+
+    def open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS validators ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, "
+            "body_hash TEXT NOT NULL, checked_at TEXT NOT NULL)"
+        )
+        self.connection.commit()
+
+    def get(self, url):
+        return self.connection.execute(
+            "SELECT etag, last_modified, body_hash FROM validators WHERE url = ?",
+            (url,),
+        ).fetchone()
+
+    def set(self, url, etag, last_modified, body_hash):
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO validators VALUES (?, ?, ?, ?, ?)",
+                (url, etag, last_modified, body_hash, now),
+            )
+
+    def touch(self, url):
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        with self.connection:
+            self.connection.execute(
+                "UPDATE validators SET checked_at = ? WHERE url = ?", (now, url)
+            )
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class ConditionalGetMiddleware:
+    """Skip pages that have not changed since the last crawl.
+
+    Requests whose callback is in CONDITIONAL_GET_CALLBACKS (or that set the
+    "conditional_get" meta key) are sent with If-None-Match/If-Modified-Since.
+    A 304, or a 200 whose body hash matches the stored one, is dropped before it
+    reaches the spider. Validators are only saved once the page has produced a
+    scraped item, so a crawl that fails halfway refetches what it lost.
+
+    Skipped pages produce no items, so the exports of a run only hold new and
+    changed pages. The page_unchanged signal lets the item store keep their
+    last_seen up to date.
+    """
+
+    def __init__(self, store, callbacks, stats, signals=None):
+        self.store = store
+        self.callbacks = set(callbacks)
+        self.stats = stats
+        self.signals = signals
+        # Validators of responses whose items have not been scraped yet
+        self.pending = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        # The HTTP cache and WARC record/replay need every page, unchanged or not
+        if (
+            not settings.getbool("CONDITIONAL_GET_ENABLED", True)
+            or settings.getbool("HTTPCACHE_ENABLED")
+            or settings.getbool("WARC_RECORD")
+            or settings.get("WARC_REPLAY")
+        ):
+            raise NotConfigured
+        s = cls(
+            store=ValidatorStore(
+                settings.get("CONDITIONAL_GET_PATH") or validator_store_path
+            ),
+            callbacks=settings.getlist("CONDITIONAL_GET_CALLBACKS", ["parse_article"]),
+            stats=crawler.stats,
+            signals=crawler.signals,
+        )
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(s.item_scraped, signal=signals.item_scraped)
+        return s
+
+    def spider_opened(self, spider):
+        self.store.open()
+
+    def spider_closed(self, spider):
+        self.store.close()
+
+    def applies_to(self, request):
+        if "conditional_get" in request.meta:
+            return request.meta["conditional_get"]
+        callback = getattr(request.callback, "__name__", None)
+        return request.method == "GET" and callback in self.callbacks
+
+    def process_request(self, request, spider):
+        if not self.applies_to(request):
+            return None
+        self.stats.inc_value("conditional_get/requests", spider=spider)
+        row = self.store.get(canonicalize_url(request.url))
+        if row is None:
+            return None
+        etag, last_modified, _ = row
+        if etag and b"If-None-Match" not in request.headers:
+            request.headers["If-None-Match"] = etag
+        if last_modified and b"If-Modified-Since" not in request.headers:
+            request.headers["If-Modified-Since"] = last_modified
+        return None
+
+    def process_response(self, request, response, spider):
+        if not self.applies_to(request):
+            return response
+        url = canonicalize_url(response.url)
+        if response.status == 304:
+            self.store.touch(url)
+            self.stats.inc_value("conditional_get/not_modified", spider=spider)
+            self.send_unchanged(request, response, spider)
+            raise IgnoreRequest(f"Not modified: {response.url}")
+        if response.status != 200:
+            return response
+        body_hash = hashlib.sha256(response.body).hexdigest()
+        row = self.store.get(url)
+        if row is not None and row[2] == body_hash:
+            self.store.touch(url)
+            self.stats.inc_value("conditional_get/unchanged_body", spider=spider)
+            self.send_unchanged(request, response, spider)
+            raise IgnoreRequest(f"Unchanged body: {response.url}")
+        self.pending[url] = (
+            response.headers.get("ETag", b"").decode("latin-1") or None,
+            response.headers.get("Last-Modified", b"").decode("latin-1") or None,
+            body_hash,
+        )
+        return response
+
+    def send_unchanged(self, request, response, spider):
+        if self.signals is not None:
+            self.signals.send_catch_log(
+                page_unchanged, request=request, response=response, spider=spider
+            )
+
+    def item_scraped(self, item, response, spider):
+        url = canonicalize_url(response.url)
+        if url in self.pending:
+            self.store.set(url, *self.pending.pop(url))
+            self.stats.inc_value("conditional_get/stored", spider=spider)
+
+
+class GlobalConcurrencyMiddleware:
+    """Cap the requests in flight across every crawler of the process.
+
+    CONCURRENT_REQUESTS and CONCURRENT_REQUESTS_PER_DOMAIN only apply to one
+    crawler. When run_all_spiders.py runs all spiders at once, this keeps the
+    total under GLOBAL_CONCURRENT_REQUESTS and the requests to one host under
+    GLOBAL_CONCURRENT_REQUESTS_PER_DOMAIN.
+    """
+
+    # Shared by the middleware instances of all crawlers
+    semaphores = {}
+
+    def __init__(self, max_requests, max_requests_per_domain, stats):
+        self.max_requests = max_requests
+        self.max_requests_per_domain = max_requests_per_domain
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        max_requests = settings.getint("GLOBAL_CONCURRENT_REQUESTS", 0)
+        max_requests_per_domain = settings.getint(
+            "GLOBAL_CONCURRENT_REQUESTS_PER_DOMAIN", 0
+        )
+        if max_requests <= 0 and max_requests_per_domain <= 0:
+            raise NotConfigured
+        return cls(max_requests, max_requests_per_domain, crawler.stats)
+
+    def semaphore(self, key, limit):
+        if key not in self.semaphores:
+            self.semaphores[key] = DeferredSemaphore(limit)
+        return self.semaphores[key]
+
+    async def process_request(self, request, spider):
+        semaphores = []
+        if self.max_requests > 0:
+            semaphores.append(self.semaphore("*", self.max_requests))
+        if self.max_requests_per_domain > 0:
+            host = urlparse(request.url).hostname or ""
+            semaphores.append(self.semaphore(host, self.max_requests_per_domain))
+        # Always in the same order, so two requests never wait on each other
+        for semaphore in semaphores:
+            if semaphore.tokens == 0:
+                self.stats.inc_value("global_concurrency/waited", spider=spider)
+            await maybe_deferred_to_future(semaphore.acquire())
+        request.meta["global_concurrency_semaphores"] = semaphores
+        return None
+
+    def release(self, request):
+        # Retried requests copy the meta, release before the retry middleware sees it
+        for semaphore in request.meta.pop("global_concurrency_semaphores", ()):
+            semaphore.release()
+
+    def process_response(self, request, response, spider):
+        self.release(request)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        self.release(request)
+        return None
+
+
 class DeloitteScraperSpiderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
     # scrapy acts as if the spider middleware does not modify the
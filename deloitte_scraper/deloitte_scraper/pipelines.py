@@ -13,22 +13,320 @@ class DeloitteScraperPipeline:
         return item
 
 
+import csv
 import datetime
-from scrapy.exporters import JsonLinesItemExporter, CsvItemExporter
+import gzip
+import io
+import json
+import os
+import queue
+import threading
+import time
+from scrapy.exceptions import NotConfigured
+from twisted.internet import task, threads
+from scrapy.utils.serialize import ScrapyJSONEncoder
+
+# zstandard is only needed for EXPORT_COMPRESSION = "zstd"
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# orjson or msgspec serialize JSON much faster than the standard library, both are optional
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
 
 timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
 
+# File name suffix added for each supported compression
+compression_extensions = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+
+def open_export_file(path, compression=None, level=None, buffer_size=-1):
+    """Open a binary file for writing, streaming it through the given compression."""
+    if compression is None:
+        return open(path, "wb", buffering=buffer_size)
+    if compression == "gzip":
+        file = gzip.open(path, "wb", compresslevel=6 if level is None else level)
+    elif compression == "zstd":
+        if zstandard is None:
+            raise NotConfigured("zstd compression requires the zstandard package")
+        compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+        file = compressor.stream_writer(open(path, "wb"))
+    else:
+        raise NotConfigured(f"Unknown export compression: {compression}")
+    # collect small writes before they reach the compressor
+    if buffer_size > 0:
+        file = io.BufferedWriter(file, buffer_size)
+    return file
+
+
+def open_exported_file(path, compression=None):
+    """Open a file written by open_export_file for reading as binary."""
+    if compression is None:
+        return open(path, "rb")
+    if compression == "gzip":
+        return gzip.open(path, "rb")
+    return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"))
+
+
+class BackgroundFileWriter:
+    """Write bytes to files from a dedicated thread fed by a bounded queue."""
+
+    def __init__(self, name, queue_size=1000, fsync_interval=0, logger=None):
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        self.fsync_interval = fsync_interval
+        self.logger = logger
+        self.files = []
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def wrap(self, file):
+        """Return a file-like object whose writes go through the writer thread."""
+        self.files.append(file)
+        return QueuedFile(self, file)
+
+    def run(self):
+        last_sync = time.monotonic()
+        while True:
+            entry = self.queue.get()
+            if entry is None:
+                break
+            file, data = entry
+            try:
+                file.write(data)
+            except Exception as e:
+                self.logger.error(f"Failed to write to {file}: {e}")
+            if (
+                self.fsync_interval
+                and time.monotonic() - last_sync >= self.fsync_interval
+            ):
+                self.sync()
+                last_sync = time.monotonic()
+
+    def sync(self):
+        for file in self.files:
+            try:
+                file.flush()
+                os.fsync(file.fileno())
+            except (OSError, ValueError) as e:
+                self.logger.warning(f"Failed to sync {file}: {e}")
+
+    def stop(self):
+        """Write everything still queued and wait for the thread to finish."""
+        self.queue.put(None)
+        self.thread.join()
+
+
+class QueuedFile:
+    def __init__(self, writer, file):
+        self.writer = writer
+        self.file = file
+
+    def write(self, data):
+        # blocks only when the queue is full, i.e. the disk is far behind the crawl
+        self.writer.queue.put((self.file, data))
+        return len(data)
+
+    def close(self):
+        self.file.close()
+
+
+class EvolvingCsvWriter:
+    """Append items to a CSV file, adding a column whenever an item brings a new field.
+
+    Rows are written in a single streaming pass. If the columns changed after the
+    header was written, close() streams the file once more to rewrite the header
+    and pad the earlier, shorter rows, without loading the file into memory.
+    """
+
+    def __init__(
+        self, path, compression=None, compression_level=None, buffer_size=-1, wrap=None
+    ):
+        self.path = path
+        self.compression = compression
+        self.compression_level = compression_level
+        self.file = open_export_file(path, compression, compression_level, buffer_size)
+        if wrap is not None:
+            self.file = wrap(self.file)
+        self.columns = []
+        self.column_set = set()
+        self.header_length = None
+        # rows are formatted in memory and written to the file as bytes
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+
+    @staticmethod
+    def format_value(value):
+        if value is None:
+            return ""
+        if isinstance(value, (list, tuple)):
+            return ",".join(str(element) for element in value)
+        return value
+
+    def encode_row(self, row):
+        self.writer.writerow(row)
+        data = self.buffer.getvalue().encode("utf-8")
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+    def write(self, data):
+        for key in data:
+            if key not in self.column_set:
+                self.column_set.add(key)
+                self.columns.append(key)
+        if self.header_length is None:
+            self.header_length = len(self.columns)
+            self.file.write(self.encode_row(self.columns))
+        row = [self.format_value(data.get(column)) for column in self.columns]
+        self.file.write(self.encode_row(row))
+
+    def close(self):
+        self.file.close()
+        if self.header_length is not None and len(self.columns) > self.header_length:
+            self.finalize()
+
+    def finalize(self):
+        temp_path = f"{self.path}.tmp"
+        width = len(self.columns)
+        with open_exported_file(
+            self.path, self.compression
+        ) as source, open_export_file(
+            temp_path, self.compression, self.compression_level
+        ) as target:
+            reader = csv.reader(io.TextIOWrapper(source, encoding="utf-8", newline=""))
+            next(reader)  # the old header
+            target.write(self.encode_row(self.columns))
+            for row in reader:
+                if len(row) < width:
+                    row.extend([""] * (width - len(row)))
+                target.write(self.encode_row(row))
+        os.replace(temp_path, self.path)
+
+
+# Handles the types the JSON libraries do not know, e.g. datetime, Decimal and sets
+scrapy_json_encoder = ScrapyJSONEncoder()
+
+
+def json_native(value):
+    """Convert what msgspec writes its own way (datetimes, dataclasses...) like Scrapy."""
+    if isinstance(value, (str, int, float)) or value is None:
+        return value
+    if isinstance(value, dict):
+        return {key: json_native(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_native(item) for item in value]
+    return json_native(scrapy_json_encoder.default(value))
+
+
+def make_json_serializer(indent=None):
+    """Return a function that turns an item dict into one line of JSON bytes.
+
+    orjson, msgspec and the standard library write the same bytes for an item,
+    the types JSON does not have go through ScrapyJSONEncoder in all three.
+    """
+    if indent is None and orjson is not None:
+        # Without the passthrough options orjson writes datetimes and dataclasses itself
+        option = (
+            orjson.OPT_APPEND_NEWLINE
+            | orjson.OPT_NON_STR_KEYS
+            | orjson.OPT_PASSTHROUGH_DATETIME
+            | orjson.OPT_PASSTHROUGH_DATACLASS
+        )
+
+        def serialize(data):
+            return orjson.dumps(
+                data, default=scrapy_json_encoder.default, option=option
+            )
+
+        return serialize
+
+    if indent is None and msgspec is not None:
+        # msgspec has no passthrough options, datetimes would be written as RFC 3339
+        encoder = msgspec.json.Encoder(enc_hook=scrapy_json_encoder.default)
+
+        def serialize(data):
+            return encoder.encode(json_native(data)) + b"\n"
+
+        return serialize
+
+    # The standard library is the fallback, and the only option for indented output
+    separators = (",", ":") if indent is None else None
+
+    def serialize(data):
+        text = json.dumps(
+            data,
+            ensure_ascii=False,
+            indent=indent,
+            separators=separators,
+            default=scrapy_json_encoder.default,
+        )
+        return (text + "\n").encode("utf-8")
+
+    return serialize
+
 
 class ExportPipeline:
+    def __init__(
+        self,
+        compression=None,
+        compression_level=None,
+        json_indent=None,
+        writer_thread=False,
+        buffer_size=1024 * 1024,
+        queue_size=1000,
+        fsync_interval=0,
+    ):
+        if compression not in compression_extensions:
+            raise NotConfigured(f"Unknown EXPORT_COMPRESSION: {compression}")
+        self.compression = compression
+        self.compression_level = compression_level
+        # one JSON object per line unless an indent is configured
+        self.serialize_json = make_json_serializer(json_indent)
+        # optionally move the file writes off the reactor thread
+        self.writer_thread = writer_thread
+        self.buffer_size = buffer_size if writer_thread else -1
+        self.queue_size = queue_size
+        self.fsync_interval = fsync_interval
+        self.writer = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        compression_level = crawler.settings.get("EXPORT_COMPRESSION_LEVEL")
+        json_indent = crawler.settings.get("EXPORT_JSON_INDENT")
+        return cls(
+            compression=crawler.settings.get("EXPORT_COMPRESSION") or None,
+            compression_level=(
+                int(compression_level) if compression_level is not None else None
+            ),
+            json_indent=int(json_indent) if json_indent is not None else None,
+            writer_thread=crawler.settings.getbool("EXPORT_WRITER_THREAD", False),
+            buffer_size=crawler.settings.getint(
+                "EXPORT_WRITE_BUFFER_SIZE", 1024 * 1024
+            ),
+            queue_size=crawler.settings.getint("EXPORT_WRITER_QUEUE_SIZE", 1000),
+            fsync_interval=crawler.settings.getfloat("EXPORT_FSYNC_INTERVAL", 0),
+        )
+
     def open_spider(self, spider):
         # Use the spider's name in the file names
+        extension = compression_extensions[self.compression]
         json_output_file_path = os.path.join(
             os.path.dirname(__file__),
             "..",
             "..",
             "data",
             "raw",
-            f"{spider.name}_{timestamp}.json",
+            f"{spider.name}_{shared_resources.timestamp}.json{extension}",
         )
         csv_output_file_path = os.path.join(
             os.path.dirname(__file__),
@@ -36,62 +334,765 @@ class ExportPipeline:
             "..",
             "data",
             "raw",
-            f"{spider.name}_{timestamp}.csv",
+            f"{spider.name}_{shared_resources.timestamp}.csv{extension}",
         )
-        self.json_output_file = open(json_output_file_path, "wb")
-        self.csv_output_file = open(csv_output_file_path, "wb")
+        wrap = None
+        if self.writer_thread:
+            self.writer = BackgroundFileWriter(
+                f"{spider.name}_export_writer",
+                queue_size=self.queue_size,
+                fsync_interval=self.fsync_interval,
+                logger=spider.logger,
+            )
+            wrap = self.writer.wrap
 
-        # Initialize the exporters
-        self.json_exporter = JsonLinesItemExporter(
-            self.json_output_file, encoding="utf-8", indent=4
+        self.json_output_file = open_export_file(
+            json_output_file_path,
+            self.compression,
+            self.compression_level,
+            self.buffer_size,
+        )
+        if wrap is not None:
+            self.json_output_file = wrap(self.json_output_file)
+        # The CSV columns grow with the fields of later items, e.g. summary
+        self.csv_writer = EvolvingCsvWriter(
+            csv_output_file_path,
+            self.compression,
+            self.compression_level,
+            self.buffer_size,
+            wrap,
         )
-        self.csv_exporter = CsvItemExporter(self.csv_output_file, encoding="utf-8")
 
-        # Start exporting
-        self.json_exporter.start_exporting()
-        self.csv_exporter.start_exporting()
+        if self.writer is not None:
+            self.writer.start()
 
     def process_item(self, item, spider):
-        # Export the data
-        self.json_exporter.export_item(item)
-        self.csv_exporter.export_item(item)
+        data = ItemAdapter(item).asdict()
+        # Serialize the item once and write the same bytes to every JSON sink
+        json_line = self.serialize_json(data)
+        self.json_output_file.write(json_line)
+        self.csv_writer.write(data)
         return item
 
     def close_spider(self, spider):
+        if self.writer is not None:
+            # Drain the writer thread without blocking the reactor
+            return threads.deferToThread(self.close_files, spider)
+        self.close_files(spider)
+
+    def close_files(self, spider):
+        if self.writer is not None:
+            self.writer.stop()
         # Finish exporting and close the files
-        self.json_exporter.finish_exporting()
         self.json_output_file.close()
-        self.csv_exporter.finish_exporting()
-        self.csv_output_file.close()
+        self.csv_writer.close()
         spider.logger.info("ExportPipeline closed the files.")
 
 
-from openai import OpenAI
+# pyarrow is only needed by ParquetExportPipeline
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+def normalize_arrow_type(column_type):
+    """Replace the null type, also inside lists and structs, by string."""
+    if pa.types.is_null(column_type):
+        return pa.string()
+    if pa.types.is_list(column_type) or pa.types.is_large_list(column_type):
+        return pa.list_(normalize_arrow_type(column_type.value_type))
+    if pa.types.is_struct(column_type):
+        return pa.struct(
+            [field.with_type(normalize_arrow_type(field.type)) for field in column_type]
+        )
+    return column_type
+
+
+def text_array(values, list_column=False):
+    """Store values that fit no common type as text, lists as lists of text."""
+
+    def text(value):
+        return None if value is None else str(value)
+
+    if not list_column:
+        return pa.array([text(value) for value in values], type=pa.string())
+    return pa.array(
+        [
+            (
+                None
+                if value is None
+                else [
+                    text(v)
+                    for v in (value if isinstance(value, (list, tuple)) else [value])
+                ]
+            )
+            for value in values
+        ],
+        type=pa.list_(pa.string()),
+    )
+
+
+def unify_arrow_schemas(schemas):
+    """One schema for all the part files, widening the types where they differ."""
+    names = []
+    for schema in schemas:
+        names.extend(name for name in schema.names if name not in names)
+    fields = []
+    for name in names:
+        types = [s.field(name).type for s in schemas if name in s.names]
+        try:
+            field = pa.unify_schemas(
+                [pa.schema([(name, t)]) for t in types], promote_options="permissive"
+            ).field(name)
+        except pa.ArrowException:
+            # e.g. text in one part and numbers or lists in another
+            is_list = any(pa.types.is_list(t) for t in types)
+            field = pa.field(name, pa.list_(pa.string()) if is_list else pa.string())
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def conform_batch(batch, schema):
+    arrays = []
+    for field in schema:
+        if field.name not in batch.schema.names:
+            arrays.append(pa.nulls(batch.num_rows, field.type))
+            continue
+        array = batch.column(field.name)
+        try:
+            array = array.cast(field.type)
+        except pa.ArrowException:
+            array = text_array(array.to_pylist(), pa.types.is_list(field.type))
+        arrays.append(array)
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class ParquetExportPipeline:
+    """Write items to a Parquet file in row groups, for column-wise analysis.
+
+    A Parquet file has a single schema. When later items add columns or change
+    their types, the rows go to a part file with the new schema, and
+    close_spider merges the parts back into one file with a schema that fits
+    them all.
+    """
+
+    def __init__(self, row_group_size=1000, compression="zstd"):
+        self.row_group_size = max(1, row_group_size)
+        self.compression = compression
+        self.spider = None
+        self.output_file_path = None
+        self.writer = None
+        self.schema = None
+        self.part_paths = []
+        self.rows = []
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if pa is None:
+            raise NotConfigured("ParquetExportPipeline requires the pyarrow package")
+        return cls(
+            row_group_size=crawler.settings.getint("PARQUET_ROW_GROUP_SIZE", 1000),
+            compression=crawler.settings.get("PARQUET_COMPRESSION", "zstd"),
+        )
+
+    def open_spider(self, spider):
+        self.spider = spider
+        # Use the spider's name in the file name, next to the JSON and CSV files
+        self.output_file_path = os.path.join(
+            os.path.dirname(__file__),
+            "..",
+            "..",
+            "data",
+            "raw",
+            f"{spider.name}_{shared_resources.timestamp}.parquet",
+        )
+
+    def process_item(self, item, spider):
+        self.rows.append(ItemAdapter(item).asdict())
+        if len(self.rows) >= self.row_group_size:
+            self.write_row_group()
+        return item
+
+    def make_batch(self, rows):
+        """Build a record batch, keeping the column types of the open file where possible."""
+        columns = list(self.schema.names) if self.schema is not None else []
+        for row in rows:
+            for key in row:
+                if key not in columns:
+                    columns.append(key)
+
+        arrays = []
+        for column in columns:
+            values = [row.get(column) for row in rows]
+            array = None
+            if self.schema is not None and column in self.schema.names:
+                try:
+                    array = pa.array(values, type=self.schema.field(column).type)
+                except pa.ArrowException:
+                    pass  # the type changed, the batch goes to a new part file
+            if array is None:
+                try:
+                    array = pa.array(values)
+                except pa.ArrowException:
+                    # Mixed values, e.g. a number in a text column, are stored as text
+                    is_list = any(isinstance(v, (list, tuple)) for v in values)
+                    array = text_array(values, is_list)
+            # Empty columns and lists have no type yet, e.g. list<null> for blog_tags
+            column_type = normalize_arrow_type(array.type)
+            if column_type != array.type:
+                array = array.cast(column_type)
+            arrays.append(array)
+        return pa.RecordBatch.from_arrays(arrays, names=columns)
+
+    def open_writer(self, schema):
+        path = self.output_file_path
+        if self.part_paths:
+            path = path.replace(".parquet", f"_part{len(self.part_paths) + 1}.parquet")
+        self.writer = pq.ParquetWriter(path, schema, compression=self.compression)
+        self.part_paths.append(path)
+        self.schema = schema
+
+    def write_row_group(self):
+        if not self.rows:
+            return
+        batch = self.make_batch(self.rows)
+        self.rows = []
+
+        if self.writer is None:
+            self.open_writer(batch.schema)
+        elif not batch.schema.equals(self.schema):
+            # A Parquet file has a single schema, new columns or types start a new part file
+            self.writer.close()
+            self.spider.logger.info(
+                f"ParquetExportPipeline schema changed, starting part {len(self.part_paths) + 1}"
+            )
+            self.open_writer(batch.schema)
+
+        self.writer.write_batch(batch, row_group_size=self.row_group_size)
+
+    def close_spider(self, spider):
+        self.write_row_group()
+        if self.writer is not None:
+            self.writer.close()
+        if len(self.part_paths) > 1:
+            self.merge_parts()
+        spider.logger.info("ParquetExportPipeline closed the files.")
+
+    def merge_parts(self):
+        """Rewrite the part files as one file, streaming them row group by row group."""
+        schema = unify_arrow_schemas([pq.read_schema(p) for p in self.part_paths])
+        temp_path = f"{self.output_file_path}.tmp"
+        with pq.ParquetWriter(
+            temp_path, schema, compression=self.compression
+        ) as writer:
+            for path in self.part_paths:
+                for batch in pq.ParquetFile(path).iter_batches(
+                    batch_size=self.row_group_size
+                ):
+                    writer.write_batch(
+                        conform_batch(batch, schema), row_group_size=self.row_group_size
+                    )
+        os.replace(temp_path, self.output_file_path)
+        for path in self.part_paths[1:]:
+            os.remove(path)
+        self.part_paths = [self.output_file_path]
+
+
+import hashlib
+import sqlite3
+from w3lib.url import canonicalize_url
+from .middlewares import page_unchanged
+
+# Default location of the consolidated item store
+item_store_path = os.path.join(
+    os.path.dirname(__file__), "..", "..", "data", "items.sqlite"
+)
+
+
+def connect_item_store(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    connection = sqlite3.connect(path)
+    # WAL lets readers query the store while a crawl is writing to it
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS items ("
+        "spider TEXT NOT NULL, url TEXT NOT NULL, data TEXT NOT NULL, "
+        "content_hash TEXT NOT NULL, first_seen TEXT NOT NULL, "
+        "last_seen TEXT NOT NULL, changed_at TEXT NOT NULL, "
+        "PRIMARY KEY (spider, url))"
+    )
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS items_last_seen ON items (last_seen)"
+    )
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS items_changed_at ON items (changed_at)"
+    )
+    connection.commit()
+    return connection
+
+
+class SQLiteStorePipeline:
+    """Upsert every item into one SQLite database keyed by spider and canonical URL."""
+
+    # Item fields that identify the page an item came from, in order of preference
+    url_fields = ("url", "link", "service_href")
+
+    def __init__(self, path=None, batch_size=100, stats=None):
+        # The path is the key of the shared connection, the same file gives the same key
+        self.path = os.path.realpath(path or item_store_path)
+        self.batch_size = max(1, batch_size)
+        self.stats = stats
+        self.connection = None
+        self.rows = []
+        # (last_seen, spider, url) of pages skipped as unchanged
+        self.seen = []
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = cls(
+            path=crawler.settings.get("ITEM_STORE_PATH"),
+            batch_size=crawler.settings.getint("ITEM_STORE_BATCH_SIZE", 100),
+            stats=crawler.stats,
+        )
+        crawler.signals.connect(s.page_unchanged, signal=page_unchanged)
+        return s
+
+    def open_spider(self, spider):
+        # Spiders writing to the same store share one connection
+        self.connection = shared_resources.acquire(
+            ("item_store", self.path), lambda: connect_item_store(self.path)
+        )
+
+    def item_key(self, data):
+        for field in self.url_fields:
+            if data.get(field):
+                return canonicalize_url(data[field])
+        # Items without a URL, e.g. menu entries, are keyed by their title
+        return f"title:{data.get('title', '')}"
+
+    def process_item(self, item, spider):
+        data = ItemAdapter(item).asdict()
+        serialized = json.dumps(
+            data,
+            ensure_ascii=False,
+            sort_keys=True,
+            default=scrapy_json_encoder.default,
+        )
+        content_hash = hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        self.rows.append(
+            (spider.name, self.item_key(data), serialized, content_hash, now, now, now)
+        )
+        if len(self.rows) >= self.batch_size:
+            self.write_rows()
+        return item
+
+    def page_unchanged(self, request, response, spider):
+        # The items of the page are still on the site, only last_seen moves
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        for url in {canonicalize_url(request.url), canonicalize_url(response.url)}:
+            self.seen.append((now, spider.name, url))
+        if len(self.seen) >= self.batch_size:
+            self.write_rows()
+
+    def write_rows(self):
+        if not self.rows and not self.seen:
+            return
+        # One transaction per batch, changed_at only moves when the content changes
+        with self.connection:
+            self.connection.executemany(
+                "UPDATE items SET last_seen = ? WHERE spider = ? AND url = ?",
+                self.seen,
+            )
+            self.connection.executemany(
+                "INSERT INTO items (spider, url, data, content_hash, first_seen, "
+                "last_seen, changed_at) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (spider, url) DO UPDATE SET "
+                "data = excluded.data, last_seen = excluded.last_seen, "
+                "changed_at = CASE WHEN items.content_hash = excluded.content_hash "
+                "THEN items.changed_at ELSE excluded.changed_at END, "
+                "content_hash = excluded.content_hash",
+                self.rows,
+            )
+        if self.stats is not None:
+            self.stats.inc_value("item_store/upserted", len(self.rows))
+            self.stats.inc_value("item_store/unchanged_seen", len(self.seen))
+        self.rows = []
+        self.seen = []
+
+    def close_spider(self, spider):
+        self.write_rows()
+        shared_resources.release(("item_store", self.path), sqlite3.Connection.close)
+        spider.logger.info(f"SQLiteStorePipeline saved items to {self.path}")
+
+
+import asyncio
+import random
+import re
+import openai
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
+from scrapy.utils.defer import deferred_from_coro
 import os
 
+# tiktoken gives exact token counts, fall back to an estimate when it is not installed
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
 # Load the environment variables from the .env file
 env_path = os.path.join(os.path.dirname(__file__), "..", "..", ".env")
 
 # Define the word count limit as a macro
 WORD_COUNT_LIMIT = 50  # You can adjust this as needed
 
+# Model used for the summaries
+OPENAI_MODEL = "gpt-4o-mini"
+
+# Prompt used for the summaries, the article text is appended after it
+SUMMARY_PROMPT = (
+    "Summarize the following content in {word_count_limit} words or fewer, "
+    "you will only return summary, do not include extra information:\n\n"
+)
+
+# Prompt used to summarize one chunk of an article that is over the token budget
+CHUNK_WORD_COUNT_LIMIT = 2 * WORD_COUNT_LIMIT
+CHUNK_SUMMARY_PROMPT = (
+    "Summarize the following part of a longer article in {word_count_limit} words "
+    "or fewer, you will only return summary, do not include extra information:\n\n"
+)
+
+# Default location of the summary cache, next to the scraped data
+summary_cache_path = os.path.join(
+    os.path.dirname(env_path), "data", "cache", "summaries.sqlite"
+)
+
+
+class SummaryCache:
+    """On-disk cache of summaries keyed by a hash of the summarization input."""
+
+    def __init__(self, path, max_age=30 * 24 * 3600, max_entries=50000):
+        # The path is the key of the shared cache, the same file gives the same key
+        self.path = os.path.realpath(path)
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.connection = None
+
+    def open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            "key TEXT PRIMARY KEY, summary TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS summaries_accessed_at "
+            "ON summaries (accessed_at)"
+        )
+        self.evict()
+        return self
+
+    @staticmethod
+    def make_key(article_text, prompt, model, word_count_limit, policy=None):
+        # Collapse whitespace so cosmetic changes in the page do not miss the cache
+        normalized_text = " ".join(article_text.split())
+        digest = hashlib.sha256()
+        parts = [model, str(word_count_limit), prompt, normalized_text]
+        # How a long article was cut down, the keys of other articles stay the same
+        if policy:
+            parts.append(policy)
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key):
+        row = self.connection.execute(
+            "SELECT summary, created_at FROM summaries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        summary, created_at = row
+        now = time.time()
+        if self.max_age and now - created_at > self.max_age:
+            return None
+        self.connection.execute(
+            "UPDATE summaries SET accessed_at = ? WHERE key = ?", (now, key)
+        )
+        self.connection.commit()
+        return summary
+
+    def set(self, key, summary):
+        now = time.time()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO summaries (key, summary, created_at, accessed_at) "
+            "VALUES (?, ?, ?, ?)",
+            (key, summary, now, now),
+        )
+        self.connection.commit()
+
+    def evict(self):
+        # Drop expired entries, then the least recently used ones above the size cap
+        if self.max_age:
+            self.connection.execute(
+                "DELETE FROM summaries WHERE created_at < ?",
+                (time.time() - self.max_age,),
+            )
+        if self.max_entries:
+            self.connection.execute(
+                "DELETE FROM summaries WHERE key IN ("
+                "SELECT key FROM summaries ORDER BY accessed_at DESC "
+                "LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        self.connection.commit()
+
+    def close(self):
+        if self.connection is not None:
+            self.evict()
+            self.connection.close()
+            self.connection = None
+
+
+class TokenCounter:
+    """Counts and splits text by model tokens without calling the API."""
+
+    # Rough number of characters per token for English text
+    chars_per_token = 4
+
+    def __init__(self, model):
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding("o200k_base")
+
+    def count(self, text):
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return -(-len(text) // self.chars_per_token)
+
+    def split(self, text, max_tokens):
+        """Split the text into consecutive chunks of at most max_tokens tokens."""
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            return [
+                self.encoding.decode(tokens[i : i + max_tokens])
+                for i in range(0, len(tokens), max_tokens)
+            ]
+
+        # Without a tokenizer, cut on word boundaries by estimated length
+        max_chars = max_tokens * self.chars_per_token
+        chunks = []
+        start = 0
+        while start < len(text):
+            end = start + max_chars
+            if end < len(text):
+                space = text.rfind(" ", start, end)
+                if space > start:
+                    end = space
+            chunk = text[start:end].strip()
+            if chunk:
+                chunks.append(chunk)
+            start = end
+        return chunks
+
+    def truncate(self, text, max_tokens):
+        chunks = self.split(text, max_tokens)
+        return chunks[0] if chunks else ""
+
+
+class OpenAIRateLimiter:
+    """Token buckets for requests and tokens per minute, shared by every spider in the process."""
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.available_requests = float(requests_per_minute)
+        self.available_tokens = float(tokens_per_minute)
+        self.updated_at = time.monotonic()
+        # set from Retry-After when the server tells us to back off
+        self.paused_until = 0.0
+
+    def refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        self.available_requests = min(
+            self.requests_per_minute,
+            self.available_requests + elapsed * self.requests_per_minute / 60,
+        )
+        self.available_tokens = min(
+            self.tokens_per_minute,
+            self.available_tokens + elapsed * self.tokens_per_minute / 60,
+        )
+        return now
+
+    async def acquire(self, tokens):
+        """Wait until one request of the given size fits in both buckets."""
+        # a single request larger than the bucket is let through once the bucket is full
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            now = self.refill()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            if self.available_requests >= 1 and self.available_tokens >= tokens:
+                self.available_requests -= 1
+                self.available_tokens -= tokens
+                return
+            wait = max(
+                (1 - self.available_requests) * 60 / self.requests_per_minute,
+                (tokens - self.available_tokens) * 60 / self.tokens_per_minute,
+            )
+            await asyncio.sleep(max(wait, 0.01))
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers):
+        """Follow the limits and remaining quota reported by the API."""
+        self.refill()
+        limit_requests = header_number(headers, "x-ratelimit-limit-requests")
+        if limit_requests:
+            self.requests_per_minute = limit_requests
+        limit_tokens = header_number(headers, "x-ratelimit-limit-tokens")
+        if limit_tokens:
+            self.tokens_per_minute = limit_tokens
+        remaining_requests = header_number(headers, "x-ratelimit-remaining-requests")
+        if remaining_requests is not None:
+            self.available_requests = min(self.available_requests, remaining_requests)
+        remaining_tokens = header_number(headers, "x-ratelimit-remaining-tokens")
+        if remaining_tokens is not None:
+            self.available_tokens = min(self.available_tokens, remaining_tokens)
+
+
+def header_number(headers, name):
+    try:
+        return float(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_after_seconds(headers):
+    """Read the back-off delay from Retry-After or the x-ratelimit-reset headers."""
+    retry_after_ms = header_number(headers, "retry-after-ms")
+    if retry_after_ms is not None:
+        return retry_after_ms / 1000
+    retry_after = header_number(headers, "retry-after")
+    if retry_after is not None:
+        return retry_after
+    # reset headers use durations such as "20ms", "1s" or "6m0s"
+    delays = []
+    for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        value = headers.get(name)
+        if not value:
+            continue
+        seconds = 0.0
+        for amount, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value):
+            seconds += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+        delays.append(seconds)
+    return max(delays) if delays else None
+
 
 class OpenAIPipeline:
-    def __init__(self):
+    def __init__(
+        self,
+        stats=None,
+        max_concurrency=8,
+        cache=None,
+        max_input_tokens=8000,
+        long_article_mode="map_reduce",
+        max_chunks=8,
+        base_url=None,
+        requests_per_minute=500,
+        tokens_per_minute=200000,
+        max_retries=6,
+    ):
+        self.spider = None
         self.client = None
+        self.stats = stats
+        # cap the number of requests in flight at any one time
+        self.max_concurrency = max(1, max_concurrency)
+        self.semaphore = None
+        self.cache = cache
+        # articles over the token budget are truncated or summarized chunk by chunk
+        self.token_counter = TokenCounter(OPENAI_MODEL)
+        self.max_input_tokens = max_input_tokens
+        self.long_article_mode = long_article_mode
+        self.max_chunks = max(1, max_chunks)
+        # requests are paced client-side so 429s are the exception, not the rule
+        self.base_url = base_url
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.rate_limiter = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        cache = None
+        if settings.getbool("OPENAI_CACHE_ENABLED", True):
+            cache = SummaryCache(
+                settings.get("OPENAI_CACHE_PATH") or summary_cache_path,
+                max_age=settings.getfloat("OPENAI_CACHE_MAX_AGE", 30 * 24 * 3600),
+                max_entries=settings.getint("OPENAI_CACHE_MAX_ENTRIES", 50000),
+            )
+        return cls(
+            stats=crawler.stats,
+            max_concurrency=settings.getint("OPENAI_MAX_CONCURRENCY", 8),
+            cache=cache,
+            max_input_tokens=settings.getint("OPENAI_MAX_INPUT_TOKENS", 8000),
+            long_article_mode=settings.get("OPENAI_LONG_ARTICLE_MODE", "map_reduce"),
+            max_chunks=settings.getint("OPENAI_MAX_CHUNKS", 8),
+            base_url=settings.get("OPENAI_BASE_URL"),
+            requests_per_minute=settings.getint("OPENAI_REQUESTS_PER_MINUTE", 500),
+            tokens_per_minute=settings.getint("OPENAI_TOKENS_PER_MINUTE", 200000),
+            max_retries=settings.getint("OPENAI_MAX_RETRIES", 6),
+        )
 
     def open_spider(self, spider):
+        self.spider = spider
+        # One client, and its connection pool, for all spiders using the endpoint
+        self.client = shared_resources.acquire(
+            ("openai", self.base_url), self.make_client
+        )
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.rate_limiter = shared_resources.rate_limiter(
+            str(self.client.base_url),
+            self.requests_per_minute,
+            self.tokens_per_minute,
+        )
+        if self.cache is not None:
+            self.cache = shared_resources.acquire(
+                ("summary_cache", self.cache.path), self.cache.open
+            )
+
+    def make_client(self):
         load_dotenv(dotenv_path=env_path)
-        # Set the OpenAI API key
-        self.client = OpenAI(
+        # Set the OpenAI API key, the async client runs on the reactor's event loop
+        # Retries are handled here so the rate limiter sees every 429
+        return AsyncOpenAI(
             api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=self.base_url,
+            max_retries=0,
         )
 
-    def process_item(self, item, spider):
+    async def process_item(self, item, spider):
         article_text = item.get("article_text", "")
         if article_text:
-            summary = self.summarize_content(article_text)
+            # Record the article size so the cost of each item can be traced
+            article_tokens = self.token_counter.count(article_text)
+            item["article_tokens"] = article_tokens
+            self.inc_stat("openai/article_tokens", article_tokens)
+            summary = await self.summarize_content(article_text, article_tokens)
             item["summary"] = summary
             spider.logger.info(f"Generated summary: {summary}")
         else:
@@ -99,37 +1100,154 @@ class OpenAIPipeline:
 
         return item
 
-    def summarize_content(self, article_text):
-        try:
-            # Prepare the prompt for summarization
-            prompt = (
-                f"Summarize the following content in {WORD_COUNT_LIMIT} words or fewer, "
-                "you will only return summary, do not include extra information:\n\n"
-                f"{article_text}"
-            )
+    async def summarize_content(self, article_text, article_tokens=None):
+        # Prepare the prompt for summarization
+        prompt = SUMMARY_PROMPT.format(word_count_limit=WORD_COUNT_LIMIT)
 
-            # Call the OpenAI API
-            chat_completion = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "system", "content": prompt}],
-                max_tokens=WORD_COUNT_LIMIT,
-                temperature=0.7,
-                service_tier="default",
-                stream=False,
+        if article_tokens is None:
+            article_tokens = self.token_counter.count(article_text)
+
+        # Reuse the summary of an identical article from a previous run
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(
+                article_text,
+                prompt,
+                OPENAI_MODEL,
+                WORD_COUNT_LIMIT,
+                self.long_article_policy(article_tokens),
             )
+            summary = self.cache.get(cache_key)
+            if summary is not None:
+                self.inc_stat("openai/cache_hit")
+                return summary
+            self.inc_stat("openai/cache_miss")
 
-            # Extract the summary from the response
-            summary = chat_completion.choices[0].message.content.strip()
-            return summary
+        try:
+            if article_tokens <= self.max_input_tokens:
+                summary = await self.complete(prompt + article_text, WORD_COUNT_LIMIT)
+            elif self.long_article_mode == "truncate":
+                # Keep only the leading content, which carries the gist of the article
+                self.inc_stat("openai/truncated_articles")
+                article_text = self.token_counter.truncate(
+                    article_text, self.max_input_tokens
+                )
+                summary = await self.complete(prompt + article_text, WORD_COUNT_LIMIT)
+            else:
+                summary = await self.summarize_chunks(article_text, prompt)
 
         except Exception as e:
-            print(f"Failed to generate summary: {e}")
+            self.spider.logger.error(f"Failed to generate summary: {e}")
             return "Failed to generate summary."
 
+        if cache_key is not None:
+            self.cache.set(cache_key, summary)
+        return summary
+
+    def long_article_policy(self, article_tokens):
+        """Describe how an article over the token budget is summarized, None if it fits."""
+        if article_tokens <= self.max_input_tokens:
+            return None
+        if self.long_article_mode == "truncate":
+            return f"truncate:{self.max_input_tokens}"
+        return f"map_reduce:{self.max_input_tokens}:{self.max_chunks}"
+
+    async def summarize_chunks(self, article_text, prompt):
+        """Summarize each chunk in parallel, then summarize the chunk summaries."""
+        self.inc_stat("openai/map_reduce_articles")
+        chunks = self.token_counter.split(article_text, self.max_input_tokens)
+        chunks = chunks[: self.max_chunks]
+        chunk_prompt = CHUNK_SUMMARY_PROMPT.format(
+            word_count_limit=CHUNK_WORD_COUNT_LIMIT
+        )
+        chunk_summaries = await asyncio.gather(
+            *(
+                self.complete(chunk_prompt + chunk, CHUNK_WORD_COUNT_LIMIT)
+                for chunk in chunks
+            )
+        )
+        return await self.complete(
+            prompt + "\n\n".join(chunk_summaries), WORD_COUNT_LIMIT
+        )
+
+    async def complete(self, content, max_tokens):
+        # the token bucket is charged for the prompt plus the completion allowance
+        estimated_tokens = self.token_counter.count(content) + max_tokens
+
+        retries = 0
+        while True:
+            # wait for a free slot, the crawl keeps going while this request waits
+            async with self.semaphore:
+                await self.rate_limiter.acquire(estimated_tokens)
+                try:
+                    # Call the OpenAI API
+                    raw_response = (
+                        await self.client.chat.completions.with_raw_response.create(
+                            model=OPENAI_MODEL,
+                            messages=[{"role": "system", "content": content}],
+                            max_tokens=max_tokens,
+                            temperature=0.7,
+                            service_tier="default",
+                            stream=False,
+                        )
+                    )
+                    break
+                except (
+                    openai.RateLimitError,
+                    openai.InternalServerError,
+                    # also covers APITimeoutError
+                    openai.APIConnectionError,
+                ) as e:
+                    if retries >= self.max_retries:
+                        raise
+                    retries += 1
+                    response = getattr(e, "response", None)
+                    delay = None
+                    if response is not None:
+                        self.inc_stat(f"openai/retry/{e.status_code}")
+                        self.rate_limiter.update_from_headers(response.headers)
+                        delay = retry_after_seconds(response.headers)
+                        error = f"OpenAI returned {e.status_code}"
+                    else:
+                        self.inc_stat(f"openai/retry/{type(e).__name__}")
+                        error = f"OpenAI request failed ({e})"
+                    if delay is None:
+                        delay = min(2**retries + random.random(), 60)
+                    self.spider.logger.warning(
+                        f"{error}, retrying in {delay:.2f} seconds..."
+                    )
+                    # every request in the process waits, not only this one
+                    self.rate_limiter.pause(delay)
+
+        self.rate_limiter.update_from_headers(raw_response.headers)
+        chat_completion = raw_response.parse()
+
+        self.inc_stat("openai/requests")
+        if chat_completion.usage is not None:
+            self.inc_stat("openai/prompt_tokens", chat_completion.usage.prompt_tokens)
+            self.inc_stat(
+                "openai/completion_tokens", chat_completion.usage.completion_tokens
+            )
+
+        # Extract the summary from the response
+        return chat_completion.choices[0].message.content.strip()
+
+    def inc_stat(self, key, count=1):
+        if self.stats is not None:
+            self.stats.inc_value(key, count)
+
+    def close_spider(self, spider):
+        if self.cache is not None:
+            shared_resources.release(
+                ("summary_cache", self.cache.path), SummaryCache.close
+            )
+        # Release the HTTP connections held by the client once no spider uses it
+        return shared_resources.release(
+            ("openai", self.base_url), lambda client: deferred_from_coro(client.close())
+        )
+
 
 import gspread
-import time
-import random
 from oauth2client.service_account import ServiceAccountCredentials
 
 # Set up the Google Sheets and Drive API credentials and scope
@@ -142,7 +1260,9 @@ credentials_path = os.path.join(os.path.dirname(env_path), "credentials.json")
 
 # GoogleSheetsPipeline class for exporting data to Google Sheets
 class GoogleSheetsPipeline:
-    def __init__(self):
+    def __init__(
+        self, batch_size=50, flush_interval=30, queue_size=10, close_timeout=300
+    ):
         self.spider = None
         self.spreadsheet_name = "Web Scraping Data"
         self.spreadsheet = None
@@ -153,30 +1273,54 @@ class GoogleSheetsPipeline:
         self.maximum_backoff = 32
         self.max_rows = 100
         self.max_cols = 20
+        # in-memory copy of the header row and the row of every title
+        self.headers = []
+        self.header_count = 0
+        self.header_indices = {}
+        self.title_rows = {}
+        self.next_row = 2
+        # items waiting to be written, flushed by count or by age in seconds
+        self.buffer = []
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.last_flush = time.monotonic()
+        self.flush_loop = None
+        # batches are written by a dedicated thread so backoff never blocks the reactor
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        self.close_timeout = close_timeout
+        self.writer = None
+        self.abort = threading.Event()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            batch_size=crawler.settings.getint("GOOGLE_SHEETS_BATCH_SIZE", 50),
+            flush_interval=crawler.settings.getfloat(
+                "GOOGLE_SHEETS_FLUSH_INTERVAL", 30
+            ),
+            queue_size=crawler.settings.getint("GOOGLE_SHEETS_QUEUE_SIZE", 10),
+            close_timeout=crawler.settings.getfloat("GOOGLE_SHEETS_CLOSE_TIMEOUT", 300),
+        )
 
     def open_spider(self, spider):
         self.spider = spider
         self.worksheet_name = f"{spider.name}_Data"
 
-        # Load the Google Sheets and Drive API credentials
-        self.credentials = ServiceAccountCredentials.from_json_keyfile_name(
-            credentials_path, scope
+        # All Google Sheets traffic, including the setup below, runs on the writer thread
+        self.writer = threading.Thread(
+            target=self.run_writer, name=f"{spider.name}_sheets_writer", daemon=True
         )
-        self.gspread_client = gspread.authorize(self.credentials)
+        self.writer.start()
 
-        # Access Google Sheets, first try opening the spreadsheet, if it doesn't exist, create a new one
-        try:
-            self.spreadsheet = self.retry_api_call(
-                self.gspread_client.open, self.spreadsheet_name
-            )
-        except gspread.SpreadsheetNotFound:
-            self.spreadsheet = self.retry_api_call(
-                self.gspread_client.create, self.spreadsheet_name
-            )
+        # Flush by age also when no new items arrive, e.g. while they wait on OpenAI
+        if self.flush_interval > 0:
+            self.flush_loop = task.LoopingCall(self.flush)
+            self.flush_loop.start(self.flush_interval, now=False)
 
-        # Set permissions
-        self.retry_api_call(
-            self.spreadsheet.share, None, perm_type="anyone", role="writer"
+    def connect(self):
+        # The spreadsheet is opened once per process, every spider adds its worksheet
+        self.spreadsheet = shared_resources.spreadsheet(
+            self.spreadsheet_name, self.open_spreadsheet
         )
 
         # Access or create worksheet
@@ -192,87 +1336,187 @@ class GoogleSheetsPipeline:
                 cols=self.max_cols,
             )
 
-    def find_next_available_row(self, worksheet):
-        str_list = self.retry_api_call(worksheet.col_values, 1)
-        str_list = list(filter(None, str_list))
-        return len(str_list) + 1
+        self.load_index(self.worksheet)
 
-    def find_column_by_header(self, worksheet, header_name):
-        headers = self.retry_api_call(worksheet.row_values, 1)
-        try:
-            return headers.index(header_name) + 1
-        except ValueError:
-            return None
+    def open_spreadsheet(self):
+        # Load the Google Sheets and Drive API credentials
+        self.credentials = ServiceAccountCredentials.from_json_keyfile_name(
+            credentials_path, scope
+        )
+        self.gspread_client = gspread.authorize(self.credentials)
 
-    def find_row_by_title(self, worksheet, title, title_column):
-        titles = self.retry_api_call(worksheet.col_values, title_column)
+        # Access Google Sheets, first try opening the spreadsheet, if it doesn't exist, create a new one
         try:
-            return titles.index(title) + 1
-        except ValueError:
-            return None
-
-    def update_worksheet(self, worksheet, data):
-        if not isinstance(data, dict):
-            self.spider.logger.error(
-                f"Invalid data format: {data}. Expected a dictionary."
+            spreadsheet = self.retry_api_call(
+                self.gspread_client.open, self.spreadsheet_name
+            )
+        except gspread.SpreadsheetNotFound:
+            spreadsheet = self.retry_api_call(
+                self.gspread_client.create, self.spreadsheet_name
             )
-            return
 
-        existing_headers = self.retry_api_call(worksheet.row_values, 1)
-        header_indices = {
-            header: index + 1 for index, header in enumerate(existing_headers)
+        # Set permissions
+        self.retry_api_call(spreadsheet.share, None, perm_type="anyone", role="writer")
+        return spreadsheet
+
+    def load_index(self, worksheet):
+        """Read the sheet once, later upserts need no reads."""
+        values = self.retry_api_call(worksheet.get_all_values) or []
+        self.headers = list(values[0]) if values else []
+        # Rows are padded to the widest one, drop the empty header cells at the end
+        while self.headers and not self.headers[-1]:
+            self.headers.pop()
+        self.header_count = len(self.headers)
+        if "title" not in self.headers:
+            self.headers.append("title")
+        self.header_indices = {
+            header: index + 1 for index, header in enumerate(self.headers)
         }
 
-        headers = list(data.keys())
-        new_headers = [header for header in headers if header not in header_indices]
+        # Row 1 holds the headers, data starts on row 2
+        title_column = self.header_indices["title"] - 1
+        self.title_rows = {}
+        for index, row in enumerate(values[1:], start=2):
+            title = row[title_column] if title_column < len(row) else ""
+            if title and title not in self.title_rows:
+                self.title_rows[title] = index
+        # New rows go below the last used row, whether or not it has a title
+        self.next_row = max(len(values) + 1, 2)
 
-        if new_headers:
-            existing_headers.extend(new_headers)
-            cell_list = self.retry_api_call(
-                worksheet.range, 1, 1, 1, len(existing_headers)
-            )
-            for i, cell in enumerate(cell_list):
-                cell.value = existing_headers[i]
-            self.retry_api_call(worksheet.update_cells, cell_list)
-            header_indices = {
-                header: index + 1 for index, header in enumerate(existing_headers)
-            }
+        # Never shrink a worksheet that is already larger than our defaults
+        self.max_rows = max(self.max_rows, worksheet.row_count)
+        self.max_cols = max(self.max_cols, worksheet.col_count)
 
-        title_column = self.find_column_by_header(worksheet, "title")
-        if title_column is None:
-            title_column = 1
-            self.retry_api_call(worksheet.update_cell, 1, 1, "title")
-            header_indices["title"] = 1
+    def update_worksheet(self, worksheet, items):
+        """Upsert a batch of items by title with a single values update.
 
-        title = data.get("title", "")
-        row_num = self.find_row_by_title(worksheet, title, title_column)
+        The index only moves forward once the batch is written, returns False
+        when it was not.
+        """
+        # Add any new columns, to copies of the index until the write succeeds
+        headers = list(self.headers)
+        header_indices = dict(self.header_indices)
+        for data in items:
+            for header in data:
+                if header not in header_indices:
+                    headers.append(header)
+                    header_indices[header] = len(headers)
 
-        if row_num is None:
-            row_num = self.find_next_available_row(worksheet)
+        # Build the rows, a title seen twice in the batch keeps its latest values
+        rows = {}
+        new_title_rows = {}
+        next_row = self.next_row
+        for data in items:
+            title = data.get("title", "")
+            row_num = self.title_rows.get(title) or new_title_rows.get(title)
+            if row_num is None:
+                row_num = next_row
+                next_row += 1
+                new_title_rows[title] = row_num
+
+            row_data = [""] * len(headers)
+            for header, value in data.items():
+                row_data[header_indices[header] - 1] = (
+                    ",".join(value) if isinstance(value, list) else value
+                )
+            rows[row_num] = row_data
 
         # Check if we need to resize the worksheet
-        if row_num > self.max_rows // 2 or len(existing_headers) > self.max_cols // 2:
-            self.max_rows *= 2
-            self.max_cols *= 2
-            self.retry_api_call(worksheet.resize, self.max_rows, self.max_cols)
+        last_row = max(rows)
+        max_rows, max_cols = self.max_rows, self.max_cols
+        while last_row > max_rows // 2 or len(headers) > max_cols // 2:
+            max_rows *= 2
+            max_cols *= 2
+        if (max_rows, max_cols) != (self.max_rows, self.max_cols):
+            if self.retry_api_call(worksheet.resize, max_rows, max_cols) is None:
+                return False
+            self.max_rows, self.max_cols = max_rows, max_cols
 
-        row_data = [""] * len(existing_headers)
+        updates = [
+            {"range": self.row_range(row_num, len(row_data)), "values": [row_data]}
+            for row_num, row_data in sorted(rows.items())
+        ]
+        if len(headers) != self.header_count:
+            updates.insert(
+                0,
+                {"range": self.row_range(1, len(headers)), "values": [headers]},
+            )
 
-        for header, value in data.items():
-            col_num = header_indices.get(header)
-            if col_num is not None:
-                row_data[col_num - 1] = (
-                    ",".join(value) if isinstance(value, list) else value
-                )
+        # retry_api_call gives up with None, errors other than 429 are raised
+        if self.retry_api_call(worksheet.batch_update, updates) is None:
+            return False
+        self.headers = headers
+        self.header_indices = header_indices
+        self.header_count = len(headers)
+        self.title_rows.update(new_title_rows)
+        self.next_row = next_row
+        return True
 
-        cell_list = self.retry_api_call(
-            worksheet.range, row_num, 1, row_num, len(existing_headers)
+    @staticmethod
+    def row_range(row_num, col_count):
+        return (
+            f"{gspread.utils.rowcol_to_a1(row_num, 1)}:"
+            f"{gspread.utils.rowcol_to_a1(row_num, col_count)}"
         )
 
-        for i, cell in enumerate(cell_list):
-            cell.value = row_data[i]
+    def run_writer(self):
+        try:
+            self.connect()
+        except Exception as e:
+            self.spider.logger.error(f"GoogleSheetsPipeline failed to connect: {e}")
+            self.worksheet = None
+
+        while True:
+            items = self.queue.get()
+            if items is None:
+                break
+            if self.worksheet is None or self.abort.is_set():
+                continue
+            try:
+                if self.update_worksheet(self.worksheet, items):
+                    self.spider.logger.debug(
+                        f"GoogleSheetsPipeline wrote {len(items)} items to {self.worksheet_name}"
+                    )
+                else:
+                    self.spider.logger.error(
+                        f"GoogleSheetsPipeline gave up writing {len(items)} items"
+                    )
+            except Exception as e:
+                self.spider.logger.error(
+                    f"GoogleSheetsPipeline failed to write {len(items)} items: {e}"
+                )
+
+    def flush(self):
+        if not self.buffer:
+            return
+        self.last_flush = time.monotonic()
+        try:
+            self.queue.put_nowait(self.buffer)
+        except queue.Full:
+            # The writer is behind, keep buffering rather than blocking the crawl
+            self.spider.logger.debug(
+                f"GoogleSheetsPipeline queue is full, holding {len(self.buffer)} items"
+            )
+            return
+        self.buffer = []
 
-        self.retry_api_call(worksheet.update_cells, cell_list)
+    def drain(self, items):
+        """Hand the last items to the writer and wait for it until the deadline."""
+        deadline = time.monotonic() + self.close_timeout
+        try:
+            if items:
+                self.queue.put(items, timeout=self.close_timeout)
+            self.queue.put(None, timeout=max(deadline - time.monotonic(), 0))
+        except queue.Full:
+            pass
+        self.writer.join(max(deadline - time.monotonic(), 0))
+        if self.writer.is_alive():
+            # Stop any backoff in progress and give up on the remaining batches
+            self.abort.set()
+            self.spider.logger.error(
+                f"GoogleSheetsPipeline did not finish within {self.close_timeout} seconds, "
+                f"{self.queue.qsize()} batches were not written"
+            )
 
     def retry_api_call(self, func, *args, max_retries=15, **kwargs):
         """Handles retrying API calls with exponential backoff."""
@@ -291,7 +1535,9 @@ class GoogleSheetsPipeline:
                     self.spider.logger.warning(
                         f"Rate limit exceeded, retrying in {sleep_time:.2f} seconds..."
                     )
-                    time.sleep(sleep_time)
+                    # wait on the abort event so close_spider can cut the backoff short
+                    if self.abort.wait(sleep_time):
+                        return None
                 else:
                     raise e
         else:
@@ -300,7 +1546,13 @@ class GoogleSheetsPipeline:
 
     def process_item(self, item, spider):
         if isinstance(item, dict):
-            self.update_worksheet(self.worksheet, item)
+            # Buffer the item, the sheet is written in batches by size or age
+            self.buffer.append(dict(item))
+            if (
+                len(self.buffer) >= self.batch_size
+                or time.monotonic() - self.last_flush >= self.flush_interval
+            ):
+                self.flush()
             return item
         else:
             spider.logger.error(
@@ -309,6 +1561,67 @@ class GoogleSheetsPipeline:
             return None
 
     def close_spider(self, spider):
-        spider.logger.info(
-            f"GoogleSheetsPipeline finished processing and saved data to {self.spreadsheet.url}"
-        )
+        if self.flush_loop is not None and self.flush_loop.running:
+            self.flush_loop.stop()
+        items, self.buffer = self.buffer, []
+        d = threads.deferToThread(self.drain, items)
+        d.addCallback(self.log_closed)
+        return d
+
+    def log_closed(self, _):
+        if self.spreadsheet is not None:
+            self.spider.logger.info(
+                f"GoogleSheetsPipeline finished processing and saved data to {self.spreadsheet.url}"
+            )
+
+
+class SharedResources:
+    """Clients and connections shared by the pipelines of every spider in the process.
+
+    Pipelines acquire a resource in open_spider and release it in close_spider,
+    the last release closes it. run_all_projects.py points the pipelines of both
+    projects at one instance, so a full refresh opens each of them once.
+    """
+
+    def __init__(self):
+        # Every export of the run has the same timestamp in its file name
+        self.timestamp = timestamp
+        # key -> [resource, number of pipelines using it], reactor thread only
+        self.resources = {}
+        # One rate limiter per API endpoint
+        self.rate_limiters = {}
+        # Spreadsheets are opened from the Sheets writer threads
+        self.spreadsheets = {}
+        self.spreadsheets_lock = threading.Lock()
+
+    def acquire(self, key, create):
+        if key not in self.resources:
+            self.resources[key] = [create(), 0]
+        entry = self.resources[key]
+        entry[1] += 1
+        return entry[0]
+
+    def release(self, key, close):
+        entry = self.resources[key]
+        entry[1] -= 1
+        if entry[1] > 0:
+            return None
+        del self.resources[key]
+        return close(entry[0])
+
+    def rate_limiter(self, base_url, requests_per_minute, tokens_per_minute):
+        if base_url not in self.rate_limiters:
+            self.rate_limiters[base_url] = OpenAIRateLimiter(
+                requests_per_minute, tokens_per_minute
+            )
+        return self.rate_limiters[base_url]
+
+    def spreadsheet(self, name, open_spreadsheet):
+        # Other writers wait for the first one, a failed open is retried by the next
+        with self.spreadsheets_lock:
+            if name not in self.spreadsheets:
+                self.spreadsheets[name] = open_spreadsheet()
+            return self.spreadsheets[name]
+
+
+shared_resources = SharedResources()
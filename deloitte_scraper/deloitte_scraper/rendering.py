@@ -0,0 +1,290 @@
+# Render pages with a pool of headless browsers without blocking the reactor
+#
+# Each render runs in one of SELENIUM_POOL_SIZE worker threads with a browser
+# of its own, and the page source comes back to the spider as a Deferred:
+#
+#     page_source = await maybe_deferred_to_future(pool.render(url, wait_for))
+#
+# Browsers are started on the first render and restarted after
+# SELENIUM_MAX_PAGES_PER_BROWSER pages, long-running Chrome sessions keep
+# growing in memory. With SELENIUM_LEAN_PROFILE the browsers skip images,
+# use a small window and block analytics, tracking, fonts and media, the
+# spiders only read the DOM. scripts/benchmark_rendering.py compares both.
+#
+# SnapshotCache keeps the rendered page source of every URL with a hash of the
+# HTML it was rendered from, so a page whose static HTML is unchanged is not
+# rendered again until its snapshot is older than RENDER_CACHE_MAX_AGE.
+#
+# extract_static_first runs a spider's extraction on the downloaded page first
+# and only renders it when that finds nothing, many pages ship their content
+# in the static HTML already.
+
+import functools
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+from scrapy.http import HtmlResponse
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from twisted.internet import threads
+from twisted.python.threadpool import ThreadPool
+
+# Requests a lean browser never sends, wildcards as in Chrome's Network.setBlockedURLs
+default_blocked_urls = [
+    # Analytics, tag managers and consent banners
+    "*adobedtm.com*",
+    "*omtrdc.net*",
+    "*demdex.net*",
+    "*everesttech.net*",
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*facebook.net*",
+    "*licdn.com*",
+    "*ads.linkedin.com*",
+    "*hotjar.com*",
+    "*qualtrics.com*",
+    "*cookielaw.org*",
+    "*onetrust.com*",
+    # Embedded videos, fonts and media
+    "*youtube.com*",
+    "*vimeo.com*",
+    "*brightcove*",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.mp4",
+    "*.webm",
+]
+
+
+def chrome_driver(lean=False, window_size=None, blocked_urls=(), headless=True):
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument("--headless=new")
+    if window_size:
+        options.add_argument(f"--window-size={window_size}")
+    if lean:
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_experimental_option(
+            "prefs", {"profile.managed_default_content_settings.images": 2}
+        )
+        options.add_argument("--disable-extensions")
+        options.add_argument("--disable-background-networking")
+        options.add_argument("--mute-audio")
+    driver = webdriver.Chrome(service=Service(), options=options)
+    if blocked_urls:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(blocked_urls)})
+    return driver
+
+
+def chrome_profile(settings):
+    """Keyword arguments of chrome_driver for the profile in settings."""
+    if not settings.getbool("SELENIUM_LEAN_PROFILE", True):
+        return {}
+    return {
+        "lean": True,
+        "window_size": settings.get("SELENIUM_WINDOW_SIZE", "1024,768"),
+        "blocked_urls": settings.getlist("SELENIUM_BLOCKED_URLS", default_blocked_urls),
+    }
+
+
+class Browser:
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except WebDriverException:
+            pass
+
+
+class RenderPool:
+    """Headless browsers rendering pages in worker threads."""
+
+    def __init__(self, size=2, max_pages=50, wait_timeout=10, create_driver=None):
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.wait_timeout = wait_timeout
+        self.create_driver = create_driver or chrome_driver
+        # Browsers not rendering anything, at most one per worker thread
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.browsers = []
+        self.threadpool = None
+        # Browsers started and restarted, for the crawl stats
+        self.started = 0
+        self.recycled = 0
+
+    @classmethod
+    def from_settings(cls, settings, create_driver=None):
+        if create_driver is None:
+            create_driver = functools.partial(chrome_driver, **chrome_profile(settings))
+        return cls(
+            size=settings.getint("SELENIUM_POOL_SIZE", 2),
+            max_pages=settings.getint("SELENIUM_MAX_PAGES_PER_BROWSER", 50),
+            wait_timeout=settings.getfloat("SELENIUM_WAIT_TIMEOUT", 10),
+            create_driver=create_driver,
+        )
+
+    def render(self, url, wait_for=None):
+        """Return a Deferred firing with the page source of url.
+
+        wait_for is a Selenium locator, e.g. (By.CLASS_NAME, "page"), the page
+        source is read once an element matches it.
+        """
+        if self.threadpool is None:
+            self.threadpool = ThreadPool(
+                minthreads=0, maxthreads=self.size, name="selenium"
+            )
+            self.threadpool.start()
+        # Imported here, spider modules are imported before Scrapy installs its reactor
+        from twisted.internet import reactor
+
+        return threads.deferToThreadPool(
+            reactor, self.threadpool, self.render_page, url, wait_for
+        )
+
+    def render_page(self, url, wait_for=None):
+        """Render url in the calling thread, with the browser it checks out."""
+        browser = self.checkout()
+        try:
+            browser.driver.get(url)
+            if wait_for is not None:
+                WebDriverWait(browser.driver, self.wait_timeout).until(
+                    EC.presence_of_element_located(wait_for)
+                )
+            page_source = browser.driver.page_source
+        except WebDriverException:
+            # A timeout or crash may leave the browser unusable, start a new one next time
+            self.discard(browser)
+            raise
+        browser.pages += 1
+        if self.max_pages and browser.pages >= self.max_pages:
+            self.discard(browser)
+            with self.lock:
+                self.recycled += 1
+        else:
+            self.idle.put(browser)
+        return page_source
+
+    def checkout(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        # One worker thread never holds two browsers, so there are never more than size
+        browser = Browser(self.create_driver())
+        with self.lock:
+            self.browsers.append(browser)
+            self.started += 1
+        return browser
+
+    def discard(self, browser):
+        with self.lock:
+            self.browsers.remove(browser)
+        browser.quit()
+
+    def close(self):
+        """Wait for the renders in progress and quit every browser, returns a Deferred."""
+        return threads.deferToThread(self.shutdown)
+
+    def shutdown(self):
+        if self.threadpool is not None:
+            self.threadpool.stop()
+            self.threadpool = None
+        with self.lock:
+            browsers, self.browsers = self.browsers, []
+        for browser in browsers:
+            browser.quit()
+        self.idle = queue.LifoQueue()
+
+
+def rendered_response(response, page_source):
+    return HtmlResponse(url=response.url, body=page_source, encoding="utf-8")
+
+
+async def extract_static_first(spider, response, extract, render):
+    """Return the output of extract on response, or on its rendering if it is empty.
+
+    extract takes a response and returns its requests and items, render is a
+    coroutine function returning the rendered page source of a response.
+    """
+    stats = spider.crawler.stats
+    output = list(extract(response))
+    if output:
+        stats.inc_value("static_first/static_hits", spider=spider)
+        return output
+    # The expected content is missing or empty, JavaScript fills it in
+    stats.inc_value("static_first/browser_fallbacks", spider=spider)
+    page_source = await render(response)
+    return list(extract(rendered_response(response, page_source)))
+
+
+snapshot_cache_path = os.path.join(
+    os.path.dirname(__file__), "..", "..", "data", "cache", "snapshots.sqlite"
+)
+
+
+class SnapshotCache:
+    """Rendered page sources keyed by URL, valid while the static HTML is unchanged."""
+
+    def __init__(self, path, max_age=24 * 3600):
+        self.path = path
+        self.max_age = max_age
+        self.connection = None
+
+    def open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            "url TEXT PRIMARY KEY, static_hash TEXT NOT NULL, "
+            "page_source TEXT NOT NULL, rendered_at REAL NOT NULL)"
+        )
+        self.evict()
+        return self
+
+    @staticmethod
+    def hash_body(body):
+        return hashlib.sha256(body).hexdigest()
+
+    def get(self, url, static_hash):
+        row = self.connection.execute(
+            "SELECT static_hash, page_source, rendered_at FROM snapshots WHERE url = ?",
+            (url,),
+        ).fetchone()
+        if row is None or row[0] != static_hash:
+            return None
+        if self.max_age and time.time() - row[2] > self.max_age:
+            return None
+        return row[1]
+
+    def set(self, url, static_hash, page_source):
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?)",
+                (url, static_hash, page_source, time.time()),
+            )
+
+    def evict(self):
+        if self.max_age:
+            with self.connection:
+                self.connection.execute(
+                    "DELETE FROM snapshots WHERE rendered_at < ?",
+                    (time.time() - self.max_age,),
+                )
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
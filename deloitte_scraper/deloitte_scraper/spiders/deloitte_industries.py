@@ -19,6 +19,8 @@ class DeloitteIndustriesSpider(scrapy.Spider):
         "ITEM_PIPELINES": {
             "deloitte_scraper.pipelines.GoogleSheetsPipeline": 200,
             "deloitte_scraper.pipelines.ExportPipeline": 300,
+            "deloitte_scraper.pipelines.ParquetExportPipeline": 310,
+            "deloitte_scraper.pipelines.SQLiteStorePipeline": 320,
         },
     }
 
@@ -1,12 +1,17 @@
 import scrapy
 import datetime
-import time
-from scrapy.http import HtmlResponse
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
+import sys
+from scrapy.utils.defer import maybe_deferred_to_future
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from w3lib.url import canonicalize_url
+from deloitte_scraper.rendering import (
+    RenderPool,
+    SnapshotCache,
+    extract_static_first,
+    rendered_response,
+    snapshot_cache_path,
+)
+from deloitte_scraper.warc import page_rendered
 
 
 class DeloitteInsightsSpider(scrapy.Spider):
@@ -22,36 +27,86 @@ class DeloitteInsightsSpider(scrapy.Spider):
         + ".log",
         "ITEM_PIPELINES": {
             "deloitte_scraper.pipelines.ExportPipeline": 300,
+            "deloitte_scraper.pipelines.ParquetExportPipeline": 310,
+            "deloitte_scraper.pipelines.SQLiteStorePipeline": 320,
         },
     }
 
+    # Override with -a start_url=..., e.g. a saved page served by a local server
+    start_url = "https://www2.deloitte.com/us/en/insights/industry.html"
+
     def __init__(self, *args, **kwargs):
         super(DeloitteInsightsSpider, self).__init__(*args, **kwargs)
-        # Initialize Selenium WebDriver
-        service = Service()
-        self.driver = webdriver.Chrome(service=service)
+        # The browsers are started on the first render, replayed crawls never need them
+        self.render_pool = None
+        self.snapshot_cache = None
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        settings = crawler.settings
+        if settings.getbool("RENDER_CACHE_ENABLED", True):
+            spider.snapshot_cache = SnapshotCache(
+                settings.get("RENDER_CACHE_PATH") or snapshot_cache_path,
+                max_age=settings.getfloat("RENDER_CACHE_MAX_AGE", 24 * 3600),
+            ).open()
+        return spider
 
     def start_requests(self):
-        url = "https://www2.deloitte.com/us/en/insights/industry.html"
-        yield scrapy.Request(url=url, callback=self.parse, dont_filter=True)
-
-    def parse(self, response):
-        # Use Selenium to load the page and wait for the content to load
-        self.driver.get(response.url)
-        WebDriverWait(self.driver, 10).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "page"))
-        )
-
-        # Get the page source after content is loaded
-        page_source = self.driver.page_source
-
-        # Create a Scrapy response from the Selenium page source
-        selenium_response = HtmlResponse(
-            url=response.url, body=page_source, encoding="utf-8"
+        yield scrapy.Request(url=self.start_url, callback=self.parse, dont_filter=True)
+
+    def render(self, url):
+        """Render url in the browser pool, returns a Deferred with the page source."""
+        if self.render_pool is None:
+            self.render_pool = RenderPool.from_settings(self.settings)
+
+        def rendered(page_source):
+            self.crawler.stats.inc_value("selenium/pages_rendered", spider=self)
+            return page_source
+
+        # Wait for the content to load before reading the page source
+        d = self.render_pool.render(url, wait_for=(By.CLASS_NAME, "page"))
+        return d.addCallback(rendered)
+
+    async def rendered_page(self, response):
+        """Return the rendered page source of response, from the cache when possible."""
+        url = canonicalize_url(response.url)
+        static_hash = SnapshotCache.hash_body(response.body)
+        page_source = None
+        if self.snapshot_cache is not None:
+            # The same static HTML renders to the same DOM, skip the browser
+            page_source = self.snapshot_cache.get(url, static_hash)
+            hit = "hit" if page_source is not None else "miss"
+            self.crawler.stats.inc_value(f"render_cache/{hit}", spider=self)
+        if page_source is None:
+            page_source = await maybe_deferred_to_future(self.render(response.url))
+            if self.snapshot_cache is not None:
+                self.snapshot_cache.set(url, static_hash, page_source)
+
+        # Let the WARC recorder keep the rendered page, cached or not
+        self.crawler.signals.send_catch_log(
+            page_rendered, url=response.url, body=page_source, spider=self
         )
-
-        # Continue with the regular parsing as before
-        filter_section = selenium_response.xpath('//section[@class="filter-section"]')
+        return page_source
+
+    async def parse(self, response):
+        # A replayed crawl carries the recorded rendering of the page
+        page_source = response.meta.get("warc_rendered_body")
+        if page_source is not None:
+            output = self.parse_listing(rendered_response(response, page_source))
+        elif self.settings.getbool("STATIC_FIRST_ENABLED", True):
+            # Only start a browser when the downloaded page has no articles
+            output = await extract_static_first(
+                self, response, self.parse_listing, self.rendered_page
+            )
+        else:
+            page_source = await self.rendered_page(response)
+            output = self.parse_listing(rendered_response(response, page_source))
+        for result in output:
+            yield result
+
+    def parse_listing(self, response):
+        filter_section = response.xpath('//section[@class="filter-section"]')
 
         if filter_section:
             pages = filter_section.xpath('.//div[@class="page"]')
@@ -96,19 +151,23 @@ class DeloitteInsightsSpider(scrapy.Spider):
         }
 
     def closed(self, reason):
-        # Close the Selenium WebDriver when the spider is closed
-        self.driver.quit()
-
-
-# For testing in a local environment
+        if self.snapshot_cache is not None:
+            self.snapshot_cache.close()
+        # Quit the browsers when the spider is closed, the crawl waits for it
+        if self.render_pool is not None:
+            stats = self.crawler.stats
+            stats.set_value("selenium/browsers_started", self.render_pool.started)
+            stats.set_value("selenium/browsers_recycled", self.render_pool.recycled)
+            return self.render_pool.close()
+
+
+# For testing in a local environment, without Scrapy:
+#     python -m http.server 8000 -d scripts/fixtures
+#     python deloitte_insights.py http://localhost:8000/deloitte_insights.html
 if __name__ == "__main__":
-    url = "https://www2.deloitte.com/us/en/insights/industry.html"
-    # Manually running Selenium for testing without Scrapy
-    service = Service(
-        "path_to_chromedriver"
-    )  # Update with the path to your ChromeDriver
-    driver = webdriver.Chrome(service=service)
-    driver.get(url)
-    time.sleep(5)  # Wait for content to load
-    print(driver.page_source)
-    driver.quit()
+    url = sys.argv[1] if len(sys.argv) > 1 else DeloitteInsightsSpider.start_url
+    pool = RenderPool(size=1)
+    try:
+        print(pool.render_page(url, wait_for=(By.CLASS_NAME, "page")))
+    finally:
+        pool.shutdown()
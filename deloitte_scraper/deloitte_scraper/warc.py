@@ -0,0 +1,234 @@
+# Record a crawl to WARC files and replay it later without the network
+#
+# Record:  python run_all_spiders.py --record
+# Replay:  python run_all_spiders.py --replay "data/warc/*.warc.gz"
+#
+# Recording writes every request/response that reaches the downloader to
+# data/warc/<spider>_<timestamp>.warc.gz, plus the pages rendered with Selenium.
+# Replaying serves the recorded responses from memory through
+# WarcReplayDownloadHandler, so a replayed crawl only measures parsing and
+# pipeline work.
+
+import datetime
+import glob
+import gzip
+import http.client
+import os
+import uuid
+from urllib.parse import urlparse
+from scrapy import signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from twisted.internet import defer
+from w3lib.http import headers_dict_to_raw, headers_raw_to_dict
+
+warc_dir = os.path.join(os.path.dirname(__file__), "..", "..", "data", "warc")
+
+# Sent by spiders after rendering a page in a browser, with url, body and spider
+page_rendered = object()
+
+
+def replay_settings(pattern):
+    """Settings that make a crawl read every response from the WARC files in pattern."""
+    handler = f"{__name__}.WarcReplayDownloadHandler"
+    return {
+        "WARC_REPLAY": pattern,
+        "DOWNLOAD_HANDLERS": {"http": handler, "https": handler},
+        "DOWNLOAD_DELAY": 0,
+        "AUTOTHROTTLE_ENABLED": False,
+        "HTTPCACHE_ENABLED": False,
+        "ROBOTSTXT_OBEY": False,
+        "CONCURRENT_REQUESTS": 64,
+        "CONCURRENT_REQUESTS_PER_DOMAIN": 64,
+        # Nothing reaches the network, GlobalConcurrencyMiddleware is not needed
+        "GLOBAL_CONCURRENT_REQUESTS": 0,
+        "GLOBAL_CONCURRENT_REQUESTS_PER_DOMAIN": 0,
+    }
+
+
+class WarcWriter:
+    """Append gzip-compressed WARC/1.0 records, one gzip member per record."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.file = open(path, "ab")
+
+    def write_record(self, warc_type, uri, content_type, block, extra_headers=None):
+        record_id = f"<urn:uuid:{uuid.uuid4()}>"
+        headers = {
+            "WARC-Type": warc_type,
+            "WARC-Record-ID": record_id,
+            "WARC-Date": datetime.datetime.now(datetime.timezone.utc).strftime(
+                "%Y-%m-%dT%H:%M:%SZ"
+            ),
+            "WARC-Target-URI": uri,
+            "Content-Type": content_type,
+            "Content-Length": str(len(block)),
+        }
+        headers.update(extra_headers or {})
+        head = "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+        record = b"WARC/1.0\r\n" + head.encode("utf-8") + b"\r\n" + block + b"\r\n\r\n"
+        self.file.write(gzip.compress(record, compresslevel=6))
+        return record_id
+
+    def write_exchange(self, request, response, fingerprint):
+        url = urlparse(request.url)
+        target = (url.path or "/") + (f"?{url.query}" if url.query else "")
+        request_block = (
+            f"{request.method} {target} HTTP/1.1\r\nHost: {url.netloc}\r\n".encode()
+            + headers_dict_to_raw(request.headers)
+            + b"\r\n\r\n"
+            + request.body
+        )
+        reason = http.client.responses.get(response.status, "")
+        response_block = (
+            f"HTTP/1.1 {response.status} {reason}\r\n".encode()
+            + headers_dict_to_raw(response.headers)
+            + b"\r\n\r\n"
+            + response.body
+        )
+        response_id = self.write_record(
+            "response",
+            response.url,
+            "application/http; msgtype=response",
+            response_block,
+            {"WARC-Scrapy-Fingerprint": fingerprint},
+        )
+        self.write_record(
+            "request",
+            request.url,
+            "application/http; msgtype=request",
+            request_block,
+            {"WARC-Concurrent-To": response_id, "WARC-Scrapy-Fingerprint": fingerprint},
+        )
+
+    def close(self):
+        self.file.close()
+
+
+def iter_warc_records(path):
+    """Yield (headers, block) for every record in a plain or gzipped WARC file."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        while True:
+            line = f.readline()
+            if not line:
+                return
+            if not line.strip():
+                continue
+            headers = {}
+            for line in iter(f.readline, b""):
+                if not line.strip():
+                    break
+                name, _, value = line.decode("utf-8").partition(":")
+                headers[name.strip()] = value.strip()
+            block = f.read(int(headers["Content-Length"]))
+            yield headers, block
+
+
+def parse_http_response(block):
+    head, _, body = block.partition(b"\r\n\r\n")
+    status_line, _, raw_headers = head.partition(b"\r\n")
+    status = int(status_line.split()[1])
+    return status, Headers(headers_raw_to_dict(raw_headers)), body
+
+
+class WarcRecorderMiddleware:
+    """Write every downloaded response, and every rendered page, to a WARC file."""
+
+    def __init__(self, directory, stats):
+        self.directory = directory
+        self.stats = stats
+        self.writer = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("WARC_RECORD"):
+            raise NotConfigured
+        s = cls(crawler.settings.get("WARC_DIR") or warc_dir, crawler.stats)
+        s.fingerprinter = crawler.request_fingerprinter
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(s.page_rendered, signal=page_rendered)
+        return s
+
+    def spider_opened(self, spider):
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.directory, f"{spider.name}_{timestamp}.warc.gz")
+        self.writer = WarcWriter(path)
+        spider.logger.info(f"Recording responses to {path}")
+
+    def spider_closed(self, spider):
+        self.writer.close()
+
+    def process_response(self, request, response, spider):
+        fingerprint = self.fingerprinter.fingerprint(request).hex()
+        self.writer.write_exchange(request, response, fingerprint)
+        self.stats.inc_value("warc/recorded", spider=spider)
+        return response
+
+    def page_rendered(self, url, body, spider):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.writer.write_record(
+            "resource",
+            url,
+            "text/html; charset=utf-8",
+            body,
+            {"WARC-Scrapy-Rendered": "1"},
+        )
+        self.stats.inc_value("warc/recorded_rendered", spider=spider)
+
+
+class WarcReplayDownloadHandler:
+    """Serve responses from the WARC files in WARC_REPLAY instead of the network.
+
+    Responses are matched by request fingerprint. Rendered pages recorded for a
+    URL are attached to the response as meta["warc_rendered_body"], so spiders
+    can skip the browser.
+    """
+
+    lazy = False
+
+    def __init__(self, settings, crawler):
+        pattern = settings.get("WARC_REPLAY")
+        if not pattern:
+            raise NotConfigured
+        self.stats = crawler.stats
+        self.fingerprinter = crawler.request_fingerprinter
+        self.responses = {}
+        self.rendered = {}
+        for path in sorted(glob.glob(pattern)):
+            for headers, block in iter_warc_records(path):
+                if headers.get("WARC-Type") == "response":
+                    self.responses[headers["WARC-Scrapy-Fingerprint"]] = (
+                        headers["WARC-Target-URI"],
+                        block,
+                    )
+                elif headers.get("WARC-Scrapy-Rendered"):
+                    self.rendered[headers["WARC-Target-URI"]] = block.decode("utf-8")
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings, crawler)
+
+    def download_request(self, request, spider):
+        fingerprint = self.fingerprinter.fingerprint(request).hex()
+        if fingerprint not in self.responses:
+            self.stats.inc_value("warc/replay_missing", spider=spider)
+            return defer.fail(IgnoreRequest(f"Not in the WARC files: {request.url}"))
+        url, block = self.responses[fingerprint]
+        status, headers, body = parse_http_response(block)
+        if url in self.rendered:
+            request.meta["warc_rendered_body"] = self.rendered[url]
+        respcls = responsetypes.from_args(headers=headers, url=url, body=body)
+        self.stats.inc_value("warc/replayed", spider=spider)
+        return defer.succeed(
+            respcls(url=url, status=status, headers=headers, body=body, request=request)
+        )
+
+    def close(self):
+        self.responses.clear()
+        self.rendered.clear()
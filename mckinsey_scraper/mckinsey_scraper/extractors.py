@@ -0,0 +1,22 @@
+# Text extraction shared by the spiders
+
+from lxml import etree
+
+# parse_article keeps the text of every paragraph and heading
+ARTICLE_TEXT_TAGS = ("p", "h1", "h2", "h3", "h4", "h5", "h6")
+
+# Compiled once. Plain strings instead of smart strings, so lxml does not keep a
+# reference to the parent of every text node
+article_text_nodes = etree.XPath(
+    " | ".join(f"//{tag}//text()" for tag in ARTICLE_TEXT_TAGS), smart_strings=False
+)
+
+
+def extract_article_text(response):
+    """Text of all paragraphs and headings, each text node stripped and joined by spaces.
+
+    Same result as response.xpath("//p//text() | ... | //h6//text()").getall()
+    followed by strip and join, without wrapping every text node in a Selector.
+    """
+    texts = (text.strip() for text in article_text_nodes(response.selector.root))
+    return " ".join(filter(None, texts))
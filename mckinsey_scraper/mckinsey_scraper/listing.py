@@ -0,0 +1,119 @@
+# Base spider for listing pages that link to articles
+#
+# A listing spider declares where its entries are and which fields to read from
+# each of them, e.g.
+#
+# class ExampleSpider(ListingSpider):
+#     name = "example"
+#     start_url = "https://www.mckinsey.com/featured-insights"
+#     blocks = '//div[contains(@class, "mck-c-generic-item")]'
+#     fields = {
+#         "title": Field(".//h5/a/span/text()", default="No title found"),
+#         "url": Field(".//h5/a/@href", url=True),
+#     }
+#     required = ("title", "url")
+#
+# The XPaths are compiled once per class, parse follows the url of every entry
+# that has all the required fields and parse_article yields the fields plus the
+# article text.
+
+import scrapy
+from lxml import etree
+from mckinsey_scraper.extractors import extract_article_text
+
+
+class Field:
+    """One field of a listing entry, an XPath in an HTML block or a key of a JSON entry."""
+
+    def __init__(self, path, default=None, url=False, strip=True, transform=None):
+        self.path = path
+        self.default = default
+        # URLs are joined with the URL of the listing page
+        self.url = url
+        self.strip = strip
+        # Applied to the raw value before it is joined or stripped
+        self.transform = transform
+
+    def finalize(self, value, base_response):
+        if value is None or value == "":
+            return self.default
+        if self.transform is not None:
+            value = self.transform(value)
+        if self.url:
+            return base_response.urljoin(value)
+        if self.strip and isinstance(value, str):
+            return value.strip()
+        return value
+
+
+class ListingSpider(scrapy.Spider):
+    # URL of the listing page
+    start_url = None
+    # XPath of the entries on the listing page, None for JSON listings
+    blocks = None
+    # Field name -> Field, in the order they appear in the items
+    fields = {}
+    # Entries missing any of these fields are skipped
+    required = ()
+    # Fields passed on to the items, all of them when None
+    item_fields = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Compile the spec once per class, every block reuses the compiled XPaths
+        cls.compiled_blocks = (
+            etree.XPath(cls.blocks, smart_strings=False) if cls.blocks else None
+        )
+        cls.compiled_fields = [
+            (
+                name,
+                field,
+                etree.XPath(field.path, smart_strings=False) if cls.blocks else None,
+            )
+            for name, field in cls.fields.items()
+        ]
+
+    def start_requests(self):
+        yield scrapy.Request(url=self.start_url, callback=self.parse, dont_filter=True)
+
+    def extract(self, block):
+        """Raw value of every field, the first match of its XPath or its JSON key."""
+        values = {}
+        for name, field, xpath in self.compiled_fields:
+            if xpath is None:
+                values[name] = block.get(field.path)
+            else:
+                result = xpath(block)
+                values[name] = result[0] if result else None
+        return values
+
+    def extract_entries(self, blocks, base_response):
+        for block in blocks:
+            values = self.extract(block)
+
+            # Skip entries without the fields the spider needs
+            if not all(values[name] for name in self.required):
+                continue
+
+            yield {
+                name: field.finalize(values[name], base_response)
+                for name, field, _ in self.compiled_fields
+            }
+
+    def parse(self, response):
+        blocks = self.compiled_blocks(response.selector.root)
+        for entry in self.extract_entries(blocks, response):
+            # Yield a request to follow the article link and parse the full article
+            yield scrapy.Request(
+                url=entry["url"],
+                callback=self.parse_article,
+                meta=entry,
+                dont_filter=True,
+            )
+
+    def parse_article(self, response):
+        item = {name: response.meta[name] for name in self.item_fields or self.fields}
+        item["article_text"] = extract_article_text(response)
+
+        # Yield the combined data to be processed by the pipeline
+        yield item
@@ -1,12 +1,19 @@
+import argparse
 import asyncio
+import datetime
+import json
+import os
 import sys
+import time
 
 if sys.platform == "win32":
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
 from twisted.internet import asyncioreactor
 
-asyncioreactor.install()
+# The spiders package imports this module again when the script lives in it
+if "twisted.internet.reactor" not in sys.modules:
+    asyncioreactor.install()
 
 from twisted.internet import reactor, defer
 from scrapy.crawler import CrawlerRunner
@@ -14,26 +21,191 @@ from scrapy.utils.project import get_project_settings
 from scrapy.utils.log import configure_logging
 from scrapy.spiderloader import SpiderLoader
 
+# Runtime of every spider, used by run_sharded_spiders.py to balance the shards
+runtimes_path = os.path.join(
+    os.path.dirname(__file__), "..", "..", "data", "cache", "spider_runtimes.json"
+)
 
-def run_all_spiders_sequentially():
+# Log of a parallel run, data/logs/<run>/crawl.log
+logs_dir = os.path.join(os.path.dirname(__file__), "..", "..", "data", "logs")
+
+
+def parallel_log_path():
+    # Scrapy has one root log handler per process, each new crawler points it at
+    # its own LOG_FILE, so spiders running at once share a single log file
+    run_dir = os.path.join(logs_dir, datetime.datetime.now().strftime("%Y%m%d_%H%M%S"))
+    os.makedirs(run_dir, exist_ok=True)
+    return os.path.join(run_dir, "crawl.log")
+
+
+def crawl_spiders(runner, spider_names, parallel=False):
+    """Crawl the spiders with runner, return one timing row per spider.
+
+    Each crawler is created when its crawl starts. Parallel crawls all start at
+    once, give them one LOG_FILE with parallel_log_path().
+    """
+    rows = []
+
+    @defer.inlineCallbacks
+    def crawl_one(spider_name):
+        print(f"Running spider: {spider_name}")
+        crawler = runner.create_crawler(spider_name)
+        start = time.perf_counter()
+        yield runner.crawl(crawler)
+        stats = crawler.stats.get_stats()
+        rows.append(
+            {
+                "spider": spider_name,
+                "elapsed": time.perf_counter() - start,
+                "items": stats.get("item_scraped_count", 0),
+                "requests": stats.get("downloader/request_count", 0),
+                "finish_reason": stats.get("finish_reason"),
+                "stats": json.loads(json.dumps(stats, default=str)),
+            }
+        )
+
+    @defer.inlineCallbacks
+    def crawl():
+        if parallel:
+            # All crawls share the reactor, GlobalConcurrencyMiddleware caps the requests
+            yield defer.DeferredList([crawl_one(name) for name in spider_names])
+        else:
+            for spider_name in spider_names:
+                yield crawl_one(spider_name)
+        return rows
+
+    return crawl()
+
+
+def project_settings(record=False, replay=None, overrides=None):
     settings = get_project_settings()
+    if record:
+        settings.set("WARC_RECORD", True, priority="cmdline")
+    if replay:
+        # the project package is importable once the project settings are loaded
+        from mckinsey_scraper.warc import replay_settings
+
+        settings.setdict(replay_settings(replay), priority="cmdline")
+    settings.setdict(overrides or {}, priority="cmdline")
+    return settings
+
+
+def run_spiders(spider_names=None, parallel=False, settings=None):
+    """Run the spiders in this process' reactor, return their timing rows."""
+    settings = settings or project_settings()
     configure_logging(settings)
     runner = CrawlerRunner(settings)
 
     # Dynamically discover all spiders in the project
-    spider_loader = SpiderLoader.from_settings(settings)
-    spider_names = spider_loader.list()
+    if spider_names is None:
+        spider_names = SpiderLoader.from_settings(settings).list()
 
-    @defer.inlineCallbacks
-    def crawl():
-        for spider_name in spider_names:
-            print(f"Running spider: {spider_name}")
-            yield runner.crawl(spider_name)
+    result = {}
+
+    def finished(rows):
+        result["rows"] = rows
         reactor.stop()
 
-    crawl()
+    def failed(failure):
+        reactor.stop()
+        return failure
+
+    crawl_spiders(runner, spider_names, parallel).addCallbacks(finished, failed)
     reactor.run()  # the script will block here until the last crawl call is finished
+    return result.get("rows", [])
+
+
+def print_timing_summary(rows, wall_time):
+    print(f"\n{'spider':45} {'seconds':>8} {'items':>7} {'requests':>9}  finish reason")
+    for row in sorted(rows, key=lambda r: r["elapsed"], reverse=True):
+        print(
+            f"{row['spider']:45} {row['elapsed']:8.1f} {row['items']:7d} "
+            f"{row['requests']:9d}  {row['finish_reason']}"
+        )
+    total = sum(row["elapsed"] for row in rows)
+    print(f"{'sum of the spiders':45} {total:8.1f}")
+    print(f"{'wall time':45} {wall_time:8.1f}")
+
+
+def load_runtimes():
+    if not os.path.exists(runtimes_path):
+        return {}
+    with open(runtimes_path) as f:
+        return json.load(f)
+
+
+def save_runtimes(rows, weight=0.5):
+    # Moving average, so one slow or aborted run does not unbalance the next ones
+    runtimes = load_runtimes()
+    for row in rows:
+        if row["finish_reason"] != "finished":
+            continue
+        previous = runtimes.get(row["spider"])
+        elapsed = row["elapsed"]
+        if previous is not None:
+            elapsed = weight * elapsed + (1 - weight) * previous
+        runtimes[row["spider"]] = round(elapsed, 2)
+    os.makedirs(os.path.dirname(runtimes_path), exist_ok=True)
+    with open(runtimes_path, "w") as f:
+        json.dump(runtimes, f, indent=2, sort_keys=True)
+
+
+def run_all_spiders(
+    parallel=False,
+    record=False,
+    replay=None,
+    max_requests=None,
+    max_requests_per_domain=None,
+):
+    overrides = {}
+    if max_requests is not None:
+        overrides["GLOBAL_CONCURRENT_REQUESTS"] = max_requests
+    if max_requests_per_domain is not None:
+        overrides["GLOBAL_CONCURRENT_REQUESTS_PER_DOMAIN"] = max_requests_per_domain
+    if parallel:
+        overrides["LOG_FILE"] = parallel_log_path()
+        overrides["LOG_FILE_APPEND"] = True
+        print(f"Logging all spiders to {os.path.abspath(overrides['LOG_FILE'])}")
+    settings = project_settings(record, replay, overrides)
+
+    start = time.perf_counter()
+    rows = run_spiders(parallel=parallel, settings=settings)
+    print_timing_summary(rows, time.perf_counter() - start)
+    save_runtimes(rows)
 
 
 if __name__ == "__main__":
-    run_all_spiders_sequentially()
+    parser = argparse.ArgumentParser(description="Run every spider in the project")
+    parser.add_argument(
+        "--parallel",
+        action="store_true",
+        help="start all spiders at once instead of one after the other",
+    )
+    parser.add_argument(
+        "--max-requests",
+        type=int,
+        metavar="N",
+        help="requests in flight across all spiders (GLOBAL_CONCURRENT_REQUESTS)",
+    )
+    parser.add_argument(
+        "--max-requests-per-domain",
+        type=int,
+        metavar="N",
+        help="requests in flight per domain across all spiders",
+    )
+    parser.add_argument(
+        "--record", action="store_true", help="record all responses to data/warc/"
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="PATTERN",
+        help='replay the WARC files matching PATTERN, e.g. "data/warc/*.warc.gz"',
+    )
+    args = parser.parse_args()
+    run_all_spiders(
+        parallel=args.parallel,
+        record=args.record,
+        replay=args.replay,
+        max_requests=args.max_requests,
+        max_requests_per_domain=args.max_requests_per_domain,
+    )
@@ -0,0 +1,180 @@
+# Run every spider of the project in a pool of worker processes
+#
+#     python run_sharded_spiders.py             # one worker per CPU core
+#     python run_sharded_spiders.py --workers 3
+#
+# Every worker runs its own reactor, so parsing, exports and pipelines use all
+# the cores instead of one. Spiders are spread over the workers by their runtime
+# in earlier runs (longest first, each to the least loaded worker). The workers
+# log to data/logs/<run>/shard_<n>.log, which are merged into
+# data/logs/<run>/crawl.log, with the stats of all spiders in stats.json.
+
+import argparse
+import datetime
+import heapq
+import json
+import multiprocessing
+import os
+import queue
+import re
+import sys
+import time
+from scrapy.spiderloader import SpiderLoader
+
+logs_dir = os.path.join(os.path.dirname(__file__), "..", "..", "data", "logs")
+
+# Lines of a log entry start with its timestamp, tracebacks continue the entry
+timestamp_re = re.compile(r"^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d")
+
+
+def balance(spider_names, runtimes, workers):
+    """Split the spiders into shards of about the same total runtime."""
+    known = [runtimes[name] for name in spider_names if name in runtimes]
+    # Spiders that never ran count as an average one
+    default = sum(known) / len(known) if known else 60
+    shards = [[] for _ in range(min(workers, len(spider_names)))]
+    loads = [(0, index) for index in range(len(shards))]
+    for name in sorted(
+        spider_names, key=lambda name: runtimes.get(name, default), reverse=True
+    ):
+        load, index = heapq.heappop(loads)
+        shards[index].append(name)
+        heapq.heappush(loads, (load + runtimes.get(name, default), index))
+    return shards
+
+
+def run_shard(index, spider_names, log_path, parallel, results):
+    from run_all_spiders import project_settings, run_spiders
+
+    settings = project_settings(overrides={"LOG_FILE": log_path})
+    rows = run_spiders(spider_names, parallel=parallel, settings=settings)
+    results.put((index, rows))
+
+
+def read_entries(path):
+    entry = []
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if timestamp_re.match(line) and entry:
+                yield entry[0][:19], "".join(entry)
+                entry = []
+            entry.append(line)
+    if entry:
+        yield entry[0][:19], "".join(entry)
+
+
+def merge_logs(log_paths, path):
+    # Each shard log is in order already, merge them by timestamp
+    entries = [read_entries(p) for p in log_paths if os.path.exists(p)]
+    with open(path, "w", encoding="utf-8") as f:
+        for _, entry in heapq.merge(*entries, key=lambda e: e[0]):
+            f.write(entry)
+
+
+def merge_stats(rows):
+    stats = {}
+    for row in rows:
+        for key, value in row["stats"].items():
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                continue
+            if key.endswith("_per_minute"):
+                continue
+            if key.startswith("memusage/"):
+                # Each worker has its own memory, the peak of one is what matters
+                stats[key] = max(stats.get(key, 0), value)
+            else:
+                stats[key] = stats.get(key, 0) + value
+    return dict(sorted(stats.items()))
+
+
+def run_sharded_spiders(workers=None, parallel=False):
+    # Imported here, Scrapy imports this module too when it is in the spiders
+    # package and run_all_spiders is only importable from this directory
+    from run_all_spiders import (
+        load_runtimes,
+        print_timing_summary,
+        project_settings,
+        save_runtimes,
+    )
+
+    settings = project_settings()
+    spider_names = SpiderLoader.from_settings(settings).list()
+    shards = balance(spider_names, load_runtimes(), workers or os.cpu_count() or 1)
+
+    run_dir = os.path.join(logs_dir, datetime.datetime.now().strftime("%Y%m%d_%H%M%S"))
+    os.makedirs(run_dir, exist_ok=True)
+    log_paths = [os.path.join(run_dir, f"shard_{i}.log") for i in range(len(shards))]
+
+    # Twisted reactors cannot be shared with forked children, start fresh ones
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = []
+    start = time.perf_counter()
+    for index, names in enumerate(shards):
+        print(f"Shard {index}: {', '.join(names)}")
+        process = context.Process(
+            target=run_shard,
+            args=(index, names, log_paths[index], parallel, results),
+            name=f"shard_{index}",
+        )
+        process.start()
+        processes.append(process)
+
+    rows = []
+    finished = set()
+    while len(finished) < len(processes):
+        try:
+            index, shard_rows = results.get(timeout=1)
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes):
+                # Results put right before the last worker exited are still readable
+                try:
+                    index, shard_rows = results.get(timeout=1)
+                except queue.Empty:
+                    break
+            else:
+                continue
+        finished.add(index)
+        rows.extend(shard_rows)
+    for process in processes:
+        process.join()
+    wall_time = time.perf_counter() - start
+
+    for index, process in enumerate(processes):
+        if index not in finished:
+            print(
+                f"Shard {index} exited with code {process.exitcode}, see {log_paths[index]}"
+            )
+
+    merge_logs(log_paths, os.path.join(run_dir, "crawl.log"))
+    stats = merge_stats(rows)
+    with open(os.path.join(run_dir, "stats.json"), "w") as f:
+        json.dump({"spiders": rows, "total": stats}, f, indent=2)
+
+    print_timing_summary(rows, wall_time)
+    save_runtimes(rows)
+    print(f"\nMerged stats of {len(rows)} spiders:")
+    for key, value in stats.items():
+        print(f"  {key}: {value}")
+    print(f"Logs and stats in {os.path.abspath(run_dir)}")
+    return rows, len(finished) == len(processes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run every spider in the project across worker processes"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        metavar="N",
+        help="worker processes, one per CPU core by default",
+    )
+    parser.add_argument(
+        "--parallel",
+        action="store_true",
+        help="start the spiders of a worker at once instead of one after the other",
+    )
+    args = parser.parse_args()
+    rows, complete = run_sharded_spiders(workers=args.workers, parallel=args.parallel)
+    sys.exit(0 if complete else 1)
@@ -86,8 +86,28 @@ DEFAULT_REQUEST_HEADERS = {
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
 DOWNLOADER_MIDDLEWARES = {
     "mckinsey_scraper.middlewares.RandomUserAgentMiddleware": 400,
+    "mckinsey_scraper.middlewares.ConditionalGetMiddleware": 580,
+    "mckinsey_scraper.warc.WarcRecorderMiddleware": 950,
+    "mckinsey_scraper.middlewares.GlobalConcurrencyMiddleware": 990,
 }
 
+# Limits shared by all spiders when run_all_spiders.py runs them in parallel
+GLOBAL_CONCURRENT_REQUESTS = 32
+GLOBAL_CONCURRENT_REQUESTS_PER_DOMAIN = 8
+
+# Conditional GET: revalidate article pages with ETag/Last-Modified and skip
+# unchanged ones, see ConditionalGetMiddleware. Skipped pages produce no items,
+# so the CSV/JSON/Parquet exports, Google Sheets and the summaries of a run only
+# hold new and changed articles, data/items.sqlite keeps them all (last_seen is
+# updated for the skipped ones). Set to False to export every article each run.
+CONDITIONAL_GET_ENABLED = True
+CONDITIONAL_GET_CALLBACKS = ["parse_article"]
+# CONDITIONAL_GET_PATH = "data/cache/validators.sqlite"
+
+# Record every response to data/warc/ for offline replay, see warc.py
+WARC_RECORD = False
+# WARC_DIR = "data/warc"
+
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
 # EXTENSIONS = {
@@ -100,8 +120,65 @@ ITEM_PIPELINES = {
     "mckinsey_scraper.pipelines.OpenAIPipeline": 100,
     "mckinsey_scraper.pipelines.GoogleSheetsPipeline": 200,
     "mckinsey_scraper.pipelines.ExportPipeline": 300,
+    "mckinsey_scraper.pipelines.ParquetExportPipeline": 310,
+    "mckinsey_scraper.pipelines.SQLiteStorePipeline": 320,
 }
 
+# Maximum number of OpenAI summaries in flight at the same time
+OPENAI_MAX_CONCURRENCY = 8
+
+# Cache summaries on disk so unchanged articles are not summarized again
+OPENAI_CACHE_ENABLED = True
+# OPENAI_CACHE_PATH = "../data/cache/summaries.sqlite"
+OPENAI_CACHE_MAX_AGE = 30 * 24 * 3600  # seconds
+OPENAI_CACHE_MAX_ENTRIES = 50000
+
+# Articles longer than this many tokens are either truncated to their leading
+# content ("truncate") or summarized chunk by chunk ("map_reduce")
+OPENAI_MAX_INPUT_TOKENS = 8000
+OPENAI_LONG_ARTICLE_MODE = "map_reduce"
+OPENAI_MAX_CHUNKS = 8
+
+# Client-side rate limits for the OpenAI API, shared by every spider in the
+# process and adjusted from the rate-limit headers returned by the API
+OPENAI_REQUESTS_PER_MINUTE = 500
+OPENAI_TOKENS_PER_MINUTE = 200000
+OPENAI_MAX_RETRIES = 6
+# Point the pipeline at another endpoint, e.g. a local fake server for testing
+# OPENAI_BASE_URL = "http://127.0.0.1:8000/v1"
+
+# GoogleSheetsPipeline buffers items and writes them in one batch update once
+# this many items are waiting or the oldest flush is this many seconds old
+GOOGLE_SHEETS_BATCH_SIZE = 50
+GOOGLE_SHEETS_FLUSH_INTERVAL = 30
+# Batches waiting for the Sheets writer thread, and how long close_spider
+# waits for the writer to catch up before giving up
+GOOGLE_SHEETS_QUEUE_SIZE = 10
+GOOGLE_SHEETS_CLOSE_TIMEOUT = 300
+
+# Compress the files written by ExportPipeline to data/raw/, None, "gzip" or
+# "zstd" (needs the zstandard package), with an optional compression level
+EXPORT_COMPRESSION = None
+# EXPORT_COMPRESSION_LEVEL = 6
+# The .json files hold one compact JSON object per line, serialized with orjson
+# or msgspec when installed, set an indent to get the old pretty-printed output
+# EXPORT_JSON_INDENT = 4
+# Write the export files from a background thread with large write buffers,
+# optionally calling fsync every EXPORT_FSYNC_INTERVAL seconds (0 disables it)
+EXPORT_WRITER_THREAD = False
+EXPORT_WRITE_BUFFER_SIZE = 1024 * 1024
+EXPORT_WRITER_QUEUE_SIZE = 1000
+EXPORT_FSYNC_INTERVAL = 0
+
+# ParquetExportPipeline (needs pyarrow) writes this many items per row group
+PARQUET_ROW_GROUP_SIZE = 1000
+PARQUET_COMPRESSION = "zstd"
+
+# SQLiteStorePipeline keeps the latest version of every item in one database,
+# keyed by spider and canonical URL, written in transactions of this many items
+# ITEM_STORE_PATH = "../data/items.sqlite"
+ITEM_STORE_BATCH_SIZE = 100
+
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
@@ -123,6 +200,11 @@ ITEM_PIPELINES = {
 # HTTPCACHE_DIR = "httpcache"
 # HTTPCACHE_IGNORE_HTTP_CODES = []
 # HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+# For selector work, cache responses zstd-compressed in one SQLite file per project
+# HTTPCACHE_STORAGE = "mckinsey_scraper.httpcache.SQLiteCacheStorage"
+# HTTPCACHE_SQLITE_MAX_SIZE = 500 * 1024 * 1024
+# Cache-only mode: never hit the network, re-parse the cached crawl
+# HTTPCACHE_IGNORE_MISSING = True
 
 # Set settings whose default value is deprecated to a future-proof value
 REQUEST_FINGERPRINTER_IMPLEMENTATION = "2.7"
@@ -1,10 +1,10 @@
-import scrapy
 from scrapy.http import HtmlResponse
 import datetime
 import requests
+from mckinsey_scraper.listing import Field, ListingSpider
 
 
-class McKinseyDigitalCaseStudiesSpider(scrapy.Spider):
+class McKinseyDigitalCaseStudiesSpider(ListingSpider):
     name = "mckinsey_capabilities_digital_case_studies"
 
     custom_settings = {
@@ -16,73 +16,25 @@ class McKinseyDigitalCaseStudiesSpider(scrapy.Spider):
         + ".log",
     }
 
-    def start_requests(self):
-        url = "https://www.mckinsey.com/capabilities/mckinsey-digital/case-studies"
-        yield scrapy.Request(url=url, callback=self.parse, dont_filter=True)
-
-    def parse(self, response):
-        main_container = response.xpath(
-            "/html/body/div[1]/main/div[2]/div/div/div[2]/div"
-        )
-        containers = main_container.xpath(
-            '//div[contains(@class, "mdc-u-grid mdc-u-grid-gutter-lg")]'
-        )
-
-        for container in containers:
-            title = container.xpath(
-                './/h5[@data-component="mdc-c-heading"]/a/span/text()'
-            ).get()
-            article_url = container.xpath(
-                './/h5[@data-component="mdc-c-heading"]/a/@href'
-            ).get()
-            image_src = container.xpath(".//picture/img/@src").get()
-            image_url = response.urljoin(image_src) if image_src else None
-            description = container.xpath(
-                './/div[@data-component="mdc-c-description"]/div/text()'
-            ).get()
-            date = container.xpath(".//time/@datetime").get()
-
-            # Skip the row if there is no title and link
-            if not title and not article_url:
-                continue
-
-            # Construct full URL for the article
-            article_full_url = response.urljoin(article_url)
-
-            # Yield a request to follow the article link and parse the full article
-            yield scrapy.Request(
-                url=article_full_url,
-                callback=self.parse_article,
-                meta={
-                    "title": title.strip() if title else "No title found",
-                    "description": (
-                        description.strip() if description else "No description found"
-                    ),
-                    "url": article_full_url,
-                    "image_url": image_url,
-                    "date": date if date else "No date found",
-                },
-                dont_filter=True,
-            )
-
-    def parse_article(self, response):
-        # Extract all text content from <p> and <h> tags
-        paragraphs = response.xpath(
-            "//p//text() | //h1//text() | //h2//text() | //h3//text() | //h4//text() | //h5//text() | //h6//text()"
-        ).getall()
-        article_text = " ".join([p.strip() for p in paragraphs if p.strip()])
-
-        item = {
-            "title": response.meta["title"],
-            "description": response.meta["description"],
-            "url": response.meta["url"],
-            "image_url": response.meta["image_url"],
-            "date": response.meta["date"],
-            "article_text": article_text,
-        }
-
-        # Yield the combined data to be processed by the pipeline
-        yield item
+    start_url = "https://www.mckinsey.com/capabilities/mckinsey-digital/case-studies"
+
+    # Case study rows within the main container
+    blocks = '/html/body/div[1]/main/div[2]/div/div/div[2]/div//div[contains(@class, "mdc-u-grid mdc-u-grid-gutter-lg")]'
+    fields = {
+        "title": Field(
+            './/h5[@data-component="mdc-c-heading"]/a/span/text()',
+            default="No title found",
+        ),
+        "description": Field(
+            './/div[@data-component="mdc-c-description"]/div/text()',
+            default="No description found",
+        ),
+        "url": Field('.//h5[@data-component="mdc-c-heading"]/a/@href', url=True),
+        "image_url": Field(".//picture/img/@src", url=True),
+        "date": Field(".//time/@datetime", default="No date found", strip=False),
+    }
+    # Skip the rows without a link
+    required = ("url",)
 
 
 # For testing in a local environment
@@ -3,9 +3,10 @@ import json
 import datetime
 import re
 from scrapy.downloadermiddlewares.retry import get_retry_request
+from mckinsey_scraper.listing import Field, ListingSpider
 
 
-class McKinseyCaseBlogSpider(scrapy.Spider):
+class McKinseyCaseBlogSpider(ListingSpider):
     name = "mckinsey_case_blog"
 
     custom_settings = {
@@ -18,6 +19,35 @@ class McKinseyCaseBlogSpider(scrapy.Spider):
         + ".log",
     }
 
+    # Fields of the entries in the results of the blog API
+    fields = {
+        "title": Field("title"),
+        "description": Field("description"),
+        "body": Field("body"),
+        "display_date": Field("displaydate"),
+        # swap the empty space to %20 in the image URL
+        "image_url": Field(
+            "imageurl", url=True, transform=lambda src: src.replace(" ", "%20")
+        ),
+        "blog_tags": Field(
+            "blogentrytags",
+            default=[],
+            transform=lambda tags: [tag.get("title") for tag in tags],
+        ),
+        "url": Field("url", url=True),
+    }
+    # Results without an article URL cannot be followed
+    required = ("url",)
+    # The API body is not stored with the article
+    item_fields = (
+        "title",
+        "description",
+        "display_date",
+        "image_url",
+        "blog_tags",
+        "url",
+    )
+
     def __init__(self, start_page=0, end_page=50, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.start_page = int(start_page)
@@ -63,24 +93,8 @@ class McKinseyCaseBlogSpider(scrapy.Spider):
         # Load JSON data
         data = json.loads(response.text)
 
-        for result in data["results"]:
-            image_src = result.get("imageurl")
-            # swap the empty space to %20 in the image URL
-            if image_src:
-                image_src = image_src.replace(" ", "%20")
-            # Extract data from the API response
-            item = {
-                "title": result.get("title"),
-                "description": result.get("description"),
-                "body": result.get("body"),
-                "display_date": result.get("displaydate"),
-                "image_url": self.base_url_response.urljoin(image_src),
-                "blog_tags": [
-                    tag.get("title") for tag in result.get("blogentrytags", [])
-                ],
-                "url": self.base_url_response.urljoin(result.get("url")),
-            }
-
+        # Extract the entries from the API response, URLs are relative to the blog page
+        for item in self.extract_entries(data["results"], self.base_url_response):
             # Follow the article URL to get the full article content, set the referer to the base URL
             yield scrapy.Request(
                 url=item["url"],
@@ -110,27 +124,6 @@ class McKinseyCaseBlogSpider(scrapy.Spider):
                     dont_filter=True,
                 )
 
-    def parse_article(self, response):
-        # Extract all text content from <p> and <h> tags
-        paragraphs = response.xpath(
-            "//p//text() | //h1//text() | //h2//text() | //h3//text() | //h4//text() | //h5//text() | //h6//text()"
-        ).getall()
-        article_text = " ".join([p.strip() for p in paragraphs if p.strip()])
-
-        # generate the dictionary to store the data
-        item = {
-            "title": response.meta["title"],
-            "description": response.meta["description"],
-            "display_date": response.meta["display_date"],
-            "image_url": response.meta["image_url"],
-            "blog_tags": response.meta["blog_tags"],
-            "url": response.meta["url"],
-            "article_text": article_text,
-        }
-
-        # Yield the combined data to pipeline
-        yield item
-
     def handle_error(self, failure):
         if failure.value.response.status_code == 403:
             self.logger.warning(f"Retrying 403 error for URL: {failure.request.url}")
@@ -2,6 +2,7 @@ import scrapy
 from scrapy.http import HtmlResponse
 import datetime
 import requests
+from mckinsey_scraper.extractors import extract_article_text
 
 
 class McKinseyCaseStudiesSpider(scrapy.Spider):
@@ -65,10 +66,7 @@ class McKinseyCaseStudiesSpider(scrapy.Spider):
 
     def parse_article(self, response):
         # Extract all text content from <p> and <h> tags
-        paragraphs = response.xpath(
-            "//p//text() | //h1//text() | //h2//text() | //h3//text() | //h4//text() | //h5//text() | //h6//text()"
-        ).getall()
-        article_text = " ".join([p.strip() for p in paragraphs if p.strip()])
+        article_text = extract_article_text(response)
 
         item = {
             "title": response.meta["title"],
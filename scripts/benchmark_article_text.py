@@ -0,0 +1,97 @@
+"""Compare extract_article_text with the XPath union the McKinsey spiders used before.
+
+Both implementations run on the saved pages in scripts/fixtures, plus a long
+article made by repeating the body of mckinsey_article.html. The script checks
+that they return the same text and prints the time per page of each, the
+HTML is parsed once per page and not timed.
+
+    python scripts/benchmark_article_text.py
+"""
+
+import argparse
+import os
+import sys
+import time
+from scrapy.http import HtmlResponse
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+fixtures_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+sys.path.insert(0, os.path.join(root, "mckinsey_scraper"))
+
+from mckinsey_scraper.extractors import extract_article_text
+
+url = "https://www.mckinsey.com/featured-insights/article"
+
+
+def legacy_article_text(response):
+    # The parse_article code of the McKinsey spiders before extract_article_text
+    paragraphs = response.xpath(
+        "//p//text() | //h1//text() | //h2//text() | //h3//text() | //h4//text() | //h5//text() | //h6//text()"
+    ).getall()
+    return " ".join([p.strip() for p in paragraphs if p.strip()])
+
+
+def load_pages():
+    pages = {}
+    for name in sorted(os.listdir(fixtures_dir)):
+        if name.endswith(".html"):
+            with open(os.path.join(fixtures_dir, name), "rb") as f:
+                pages[name] = f.read()
+    # A long insight page, the article body repeated ten times
+    article = pages["mckinsey_article.html"]
+    start = article.index(b'<div class="mck-c-article__body">')
+    end = article.index(b'<div class="mck-c-authors">')
+    pages["mckinsey_article.html x10"] = (
+        article[:start] + article[start:end] * 10 + article[end:]
+    )
+    return pages
+
+
+def time_per_page(function, response, min_time):
+    # Parsing the HTML costs the same for both, the tree is built once and not timed
+    response.selector
+    number = 0
+    start = time.perf_counter()
+    while True:
+        function(response)
+        number += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--rounds", type=int, default=5, help="timed rounds, the best one counts"
+    )
+    parser.add_argument(
+        "--min-round-time", type=float, default=0.2, help="seconds per round"
+    )
+    args = parser.parse_args()
+
+    mismatches = 0
+    print(f"{'page':44} {'KiB':>6} {'legacy us':>10} {'new us':>10} {'speedup':>8}")
+    for name, body in load_pages().items():
+        response = HtmlResponse(url=url, body=body, encoding="utf-8")
+        if extract_article_text(response) != legacy_article_text(response):
+            print(f"MISMATCH {name}")
+            mismatches += 1
+            continue
+        legacy = min(
+            time_per_page(legacy_article_text, response, args.min_round_time)
+            for _ in range(args.rounds)
+        )
+        new = min(
+            time_per_page(extract_article_text, response, args.min_round_time)
+            for _ in range(args.rounds)
+        )
+        print(
+            f"{name:44} {len(body) / 1024:6.0f} {legacy * 1e6:10.0f} "
+            f"{new * 1e6:10.0f} {legacy / new:7.2f}x"
+        )
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
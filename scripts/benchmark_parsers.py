@@ -0,0 +1,283 @@
+"""Benchmark every spider callback against the saved pages in scripts/fixtures.
+
+Each case feeds one fixture to one callback, checks that the output still
+matches the baseline and reports the time per page. The run fails when the
+output changed, so selector changes can be checked before a crawl.
+
+    python scripts/benchmark_parsers.py                  # compare with the baseline
+    python scripts/benchmark_parsers.py -k parse_article # only some cases
+    python scripts/benchmark_parsers.py --dump mckinsey_case_blog.parse_api
+    python scripts/benchmark_parsers.py --save-baseline  # accept the current output and timings
+    python scripts/benchmark_parsers.py --check-timing   # also fail on slower callbacks
+
+The output digests in scripts/fixtures/baseline.json are committed. Timings
+depend on the machine, so --save-baseline keeps them in
+data/cache/benchmark_timings.json, which is not committed, and the timing
+columns compare with the timings saved on this machine.
+"""
+
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import sys
+import time
+import scrapy
+from scrapy.http import HtmlResponse, TextResponse
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+fixtures_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+baseline_path = os.path.join(fixtures_dir, "baseline.json")
+timings_path = os.path.join(root, "data", "cache", "benchmark_timings.json")
+
+# Both projects are importable side by side, the package names differ
+sys.path.insert(0, os.path.join(root, "mckinsey_scraper"))
+sys.path.insert(0, os.path.join(root, "deloitte_scraper"))
+
+mckinsey = "https://www.mckinsey.com"
+deloitte = "https://www2.deloitte.com/us/en"
+blog_url = f"{mckinsey}/about-us/new-at-mckinsey-blog"
+api_url = "https://prd-api.mckinsey.com/v1/blogs/new-at-mckinsey-blog"
+digital = f"{mckinsey}/capabilities/mckinsey-digital"
+
+# (spider, callback, fixture, url)
+# Cases without a url take the url and meta of the first request of the
+# listing case of the same spider, like a crawl would
+# fmt: off
+CASES = [
+    ("mckinsey_capabilities", "parse", "mckinsey_capabilities.html", f"{mckinsey}/capabilities"),
+    ("mckinsey_capabilities_digital", "parse", "mckinsey_capabilities_digital.html", f"{digital}/how-we-help-clients"),
+    ("mckinsey_capabilities_digital_case_studies", "parse", "mckinsey_case_studies.html", f"{digital}/case-studies"),
+    ("mckinsey_capabilities_digital_case_studies", "parse_article", "mckinsey_article.html", None),
+    ("mckinsey_capabilities_digital_insights", "parse", "mckinsey_capabilities_digital_insights.html", f"{digital}/our-insights"),
+    ("mckinsey_capabilities_digital_insights", "parse_article", "mckinsey_article.html", None),
+    ("mckinsey_case_blog", "parse_api", "mckinsey_blog_api.json", api_url),
+    ("mckinsey_case_blog", "parse_article", "mckinsey_article.html", None),
+    ("mckinsey_case_studies", "parse", "mckinsey_case_studies.html", f"{mckinsey}/about-us/case-studies"),
+    ("mckinsey_case_studies", "parse_article", "mckinsey_article.html", None),
+    ("mckinsey_featured_insights", "parse", "mckinsey_featured_insights.html", f"{mckinsey}/featured-insights"),
+    ("mckinsey_featured_insights", "parse_article", "mckinsey_article.html", None),
+    ("deloitte_industries", "parse", "deloitte_home.html", f"{deloitte}.html"),
+    ("deloitte_services", "parse", "deloitte_home.html", f"{deloitte}.html"),
+    ("deloitte_insights", "parse", "deloitte_insights.html", f"{deloitte}/insights/industry.html"),
+    ("deloitte_insights", "parse_article", "deloitte_article.html", None),
+]
+# fmt: on
+
+
+class Case:
+    def __init__(self, spider_name, callback, fixture, url):
+        self.project = spider_name.split("_")[0] + "_scraper"
+        self.spider_name = spider_name
+        self.callback = callback
+        self.fixture = fixture
+        self.url = url
+        self.meta = {}
+        self.name = f"{spider_name}.{callback}"
+        with open(os.path.join(fixtures_dir, fixture), "rb") as f:
+            self.body = f.read()
+        self.spider = self.load_spider()
+
+    def load_spider(self):
+        module = importlib.import_module(f"{self.project}.spiders.{self.spider_name}")
+        for value in vars(module).values():
+            if (
+                isinstance(value, type)
+                and issubclass(value, scrapy.Spider)
+                and getattr(value, "name", None) == self.spider_name
+            ):
+                spider = value()
+                # parse_api joins URLs against the blog page that set the cookies
+                spider.base_url_response = HtmlResponse(url=blog_url, body=b"")
+                return spider
+        raise LookupError(f"No spider named {self.spider_name} in {module.__name__}")
+
+    def make_response(self):
+        meta = dict(self.meta)
+        if self.spider_name == "deloitte_insights" and self.callback == "parse":
+            # Stands in for the Selenium rendering, as in a replayed crawl
+            meta["warc_rendered_body"] = self.body.decode("utf-8")
+        request = scrapy.Request(self.url, meta=meta)
+        if self.fixture.endswith(".json"):
+            return TextResponse(
+                url=self.url, body=self.body, encoding="utf-8", request=request
+            )
+        return HtmlResponse(
+            url=self.url, body=self.body, encoding="utf-8", request=request
+        )
+
+    def run(self):
+        output = getattr(self.spider, self.callback)(self.make_response())
+        if hasattr(output, "__anext__"):
+            return drain(output)
+        return list(output or [])
+
+
+def drain(agen):
+    # Async callbacks only await the browser, which the fixtures stand in for
+    outputs = []
+    while True:
+        try:
+            agen.__anext__().send(None)
+        except StopIteration as e:
+            outputs.append(e.value)
+        except StopAsyncIteration:
+            return outputs
+
+
+def to_json(output):
+    if isinstance(output, scrapy.Request):
+        return {
+            "request": output.url,
+            "callback": getattr(output.callback, "__name__", None),
+            "meta": output.meta,
+        }
+    return dict(output)
+
+
+def digest(outputs):
+    serialized = json.dumps([to_json(o) for o in outputs], sort_keys=True, default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+def load_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load_cases():
+    cases = [Case(*args) for args in CASES]
+    listings = {}
+    for case in cases:
+        if case.url is None:
+            # Follow the first request of the listing case of the same spider
+            request = next(
+                o
+                for o in listings[case.spider_name].run()
+                if isinstance(o, scrapy.Request)
+            )
+            case.url = request.url
+            case.meta = dict(request.meta)
+        else:
+            listings.setdefault(case.spider_name, case)
+    return cases
+
+
+def time_case(case, rounds, min_round_time):
+    # Grow the number of pages per round until a round takes min_round_time
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            case.run()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_round_time:
+            break
+        number *= 2
+    best = elapsed / number
+    for _ in range(rounds - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            case.run()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark spider callbacks on saved fixtures"
+    )
+    parser.add_argument(
+        "-k", dest="pattern", help="only run cases whose name contains PATTERN"
+    )
+    parser.add_argument(
+        "--rounds", type=int, default=5, help="timed rounds, the best one counts"
+    )
+    parser.add_argument(
+        "--min-round-time", type=float, default=0.2, help="seconds per round"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.5, help="allowed slowdown, 0.5 = 50%%"
+    )
+    parser.add_argument(
+        "--check-timing",
+        action="store_true",
+        help="fail when a callback is slower than the timings saved on this machine",
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="write the results to the baseline"
+    )
+    parser.add_argument(
+        "--dump", metavar="CASE", help="print the output of one case and exit"
+    )
+    args = parser.parse_args()
+
+    cases = load_cases()
+    if args.dump:
+        case = next(c for c in cases if c.name == args.dump)
+        print(json.dumps([to_json(o) for o in case.run()], indent=2, default=str))
+        return 0
+    if args.pattern:
+        cases = [c for c in cases if args.pattern in c.name]
+
+    baseline = load_json(baseline_path)
+    timings = load_json(timings_path)
+
+    results = {}
+    failures = []
+    print(
+        f"{'case':60} {'out/page':>8} {'us/page':>10} {'pages/s':>9} {'out/s':>10} {'vs base':>8}"
+    )
+    for case in cases:
+        outputs = case.run()
+        seconds = time_case(case, args.rounds, args.min_round_time)
+        result = {"outputs": len(outputs), "sha256": digest(outputs)}
+        results[case.name] = (result, round(seconds * 1e6, 1))
+
+        expected = baseline.get(case.name)
+        if expected and result["sha256"] != expected["sha256"]:
+            failures.append(
+                f"{case.name}: output changed ({expected['outputs']} -> "
+                f"{result['outputs']} outputs), inspect it with --dump {case.name}"
+            )
+        ratio = ""
+        if case.name in timings:
+            change = seconds * 1e6 / timings[case.name] - 1
+            ratio = f"{change:+.0%}"
+            if args.check_timing and change > args.tolerance:
+                failures.append(
+                    f"{case.name}: {seconds * 1e6:.0f} us/page, {change:.0%} slower "
+                    f"than the saved timing {timings[case.name]:.0f} us/page"
+                )
+        print(
+            f"{case.name:60} {len(outputs):8d} {seconds * 1e6:10.0f} "
+            f"{1 / seconds:9.0f} {len(outputs) / seconds:10.0f} {ratio:>8}"
+        )
+
+    if args.save_baseline:
+        baseline.update({name: result for name, (result, _) in results.items()})
+        save_json(baseline_path, baseline)
+        timings.update({name: us for name, (_, us) in results.items()})
+        save_json(timings_path, timings)
+        print(
+            f"Saved the baseline to {baseline_path} and the timings to {timings_path}"
+        )
+        return 0
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""Compare render time and browser memory of the Chrome profiles of deloitte_insights.
+
+The profiles render the saved Deloitte pages in scripts/fixtures, served by a
+local HTTP server, plus any URL given on the command line:
+
+- original: the driver the spider used before the render pool, a visible
+  Chrome with its default window, it needs a display
+- headless: the same, headless
+- lean: headless with SELENIUM_LEAN_PROFILE, no images, a smaller window and
+  analytics, tracking, fonts and media blocked
+
+The saved pages have no images or third-party requests, so pass a live page to
+see what the blocking saves:
+
+    python scripts/benchmark_rendering.py
+    python scripts/benchmark_rendering.py https://www2.deloitte.com/us/en/insights/industry.html
+    python scripts/benchmark_rendering.py --profiles headless lean   # without a display
+
+Memory is the resident size of all the browser processes after the renders,
+it needs psutil (pip install psutil). Needs Chrome, like the spiders.
+"""
+
+import argparse
+import functools
+import http.server
+import os
+import statistics
+import sys
+import threading
+import time
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+fixtures_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+sys.path.insert(0, os.path.join(root, "deloitte_scraper"))
+
+from scrapy.settings import Settings
+from deloitte_scraper.rendering import chrome_driver, chrome_profile
+
+fixtures = ["deloitte_insights.html", "deloitte_home.html", "deloitte_article.html"]
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_fixtures():
+    handler = functools.partial(QuietHandler, directory=fixtures_dir)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def browser_memory(driver):
+    # chromedriver starts Chrome, which starts a process per renderer, GPU, network...
+    if psutil is None:
+        return None
+    service = psutil.Process(driver.service.process.pid)
+    processes = service.children(recursive=True)
+    return sum(p.memory_info().rss for p in processes if p.is_running())
+
+
+def benchmark(profile, urls, rounds):
+    driver = chrome_driver(**profile)
+    try:
+        results = {}
+        for url in urls:
+            driver.get(url)  # warm up the cache of the profile like a long crawl would
+            timings = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                driver.get(url)
+                timings.append(time.perf_counter() - start)
+            results[url] = statistics.median(timings)
+        return results, browser_memory(driver)
+    finally:
+        driver.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the default and lean Chrome profiles"
+    )
+    parser.add_argument("urls", nargs="*", metavar="url", help="extra pages to render")
+    parser.add_argument(
+        "--rounds", type=int, default=5, help="renders per page, the median counts"
+    )
+    parser.add_argument(
+        "--profiles",
+        nargs="+",
+        choices=["original", "headless", "lean"],
+        default=["original", "headless", "lean"],
+        help="profiles to compare, the first one is the reference",
+    )
+    args = parser.parse_args()
+
+    server = serve_fixtures()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [f"{base_url}/{name}" for name in fixtures] + args.urls
+
+    settings = Settings()
+    settings.setmodule("deloitte_scraper.settings", priority="project")
+    settings.set("SELENIUM_LEAN_PROFILE", True)
+    profiles = {
+        "original": {"headless": False},
+        "headless": {},
+        "lean": chrome_profile(settings),
+    }
+
+    results = {}
+    for name in args.profiles:
+        results[name] = benchmark(profiles[name], urls, args.rounds)
+    server.shutdown()
+
+    # Every profile after the first is compared with the first one
+    header = "".join(f" {name + ' ms':>12}" for name in args.profiles)
+    header += "".join(f" {name + ' change':>16}" for name in args.profiles[1:])
+    print(f"{'page':60}{header}")
+    for url in urls:
+        timings = [results[name][0][url] for name in args.profiles]
+        line = "".join(f" {seconds * 1e3:12.0f}" for seconds in timings)
+        line += "".join(
+            f" {seconds / timings[0] - 1:+16.0%}" for seconds in timings[1:]
+        )
+        print(f"{url:60}{line}")
+    memory = [results[name][1] for name in args.profiles]
+    if None in memory:
+        print("Install psutil to measure the browser memory")
+    else:
+        line = "".join(f" {size / 2**20:12.0f}" for size in memory)
+        line += "".join(f" {size / memory[0] - 1:+16.0%}" for size in memory[1:])
+        print(f"{'browser memory (MB)':60}{line}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
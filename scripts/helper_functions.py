@@ -0,0 +1,20 @@
+import gzip
+import io
+
+# zstandard is only needed to read .zst files
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def open_data_file(path, encoding="utf-8"):
+    """Open a scraped data file for reading as text, decompressing .gz and .zst files."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding=encoding)
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise ImportError("Reading .zst files requires the zstandard package")
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"))
+        return io.TextIOWrapper(reader, encoding=encoding)
+    return open(path, "r", encoding=encoding)
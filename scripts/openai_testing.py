@@ -2,6 +2,7 @@ import json
 from openai import OpenAI
 from dotenv import load_dotenv
 import os
+from helper_functions import open_data_file
 
 # Load the environment variables from the .env file
 load_dotenv(
@@ -52,10 +53,33 @@ def main():
     input_file = "sample_input.json"  # Replace with your JSON file path
     output_file = "sample_output_with_summaries.json"  # Output file path
     items = []
+    whole_file = False
+
+    # The exports are JSON lines, stream them one object per line.
+    # Compressed exports (.gz, .zst) are decompressed transparently
+    with open_data_file(input_file) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)  # Parse each line as a JSON object
+            except json.JSONDecodeError as e:
+                if not items:
+                    # Not JSON lines, e.g. an indented file or a list of dicts
+                    whole_file = True
+                    break
+                print(f"Error decoding JSON on line: {line}. Error: {e}")
+                continue
+            if isinstance(item, list):
+                items.extend(item)  # A whole list of dicts on a single line
+            else:
+                items.append(item)
 
-    with open(input_file, "r", encoding="utf-8") as f:
-        try:
-            content = json.load(f)  # Try to load the entire file as a list of dicts
+    if whole_file:
+        # Reopen the file, compressed streams cannot seek back to the beginning
+        with open_data_file(input_file) as f:
+            content = json.load(f)  # Load the entire file as a list of dicts
             if isinstance(
                 content, dict
             ):  # If the content is a single dictionary, make it a list
@@ -66,15 +90,6 @@ def main():
                 print(
                     f"Unexpected data format: {content}. Expected a list or dictionary."
                 )
-        except json.JSONDecodeError:
-            # If loading the entire file fails, try line by line processing
-            f.seek(0)  # Reset the file pointer to the beginning
-            for line in f:
-                try:
-                    item = json.loads(line.strip())  # Parse each line as a JSON object
-                    items.append(item)
-                except json.JSONDecodeError as e:
-                    print(f"Error decoding JSON on line: {line}. Error: {e}")
 
     # Process each item in the JSON file
     for item in items:
@@ -0,0 +1,177 @@
+"""Run the spiders of the McKinsey and Deloitte projects in one process.
+
+Each project keeps its own settings and gets its own CrawlerRunner, all of
+them run in the same reactor. The pipelines of both projects use one set of
+shared resources: one OpenAI client and rate limiter per endpoint, one summary
+cache, one Google Sheets spreadsheet, one item store connection and one
+timestamp for the exported files.
+
+    python scripts/run_all_projects.py              # project after project
+    python scripts/run_all_projects.py --parallel   # every spider at once
+    python scripts/run_all_projects.py mckinsey     # only some projects
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import time
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+projects = ["mckinsey_scraper", "deloitte_scraper"]
+
+# Both projects are importable side by side, the package names differ
+for project in projects:
+    sys.path.insert(0, os.path.join(root, project))
+
+# Installs the asyncio reactor, like running the project's own runner
+from mckinsey_scraper.run_all_spiders import (
+    crawl_spiders,
+    parallel_log_path,
+    print_timing_summary,
+    save_runtimes,
+)
+from twisted.internet import reactor, defer
+from scrapy.crawler import CrawlerRunner
+from scrapy.settings import Settings
+from scrapy.spiderloader import SpiderLoader
+from scrapy.utils.log import configure_logging
+
+
+def load_settings(project, record=False, replay=None, overrides=None):
+    settings = Settings()
+    settings.setmodule(f"{project}.settings", priority="project")
+    if record:
+        settings.set("WARC_RECORD", True, priority="cmdline")
+    if replay:
+        warc = importlib.import_module(f"{project}.warc")
+        settings.setdict(warc.replay_settings(replay), priority="cmdline")
+    settings.setdict(overrides or {}, priority="cmdline")
+    return settings
+
+
+def share_resources(project_names):
+    """Point every project at the pipeline resources and request limits of the first."""
+    first = project_names[0]
+    pipelines = importlib.import_module(f"{first}.pipelines")
+    middlewares = importlib.import_module(f"{first}.middlewares")
+    for project in project_names[1:]:
+        importlib.import_module(f"{project}.pipelines").shared_resources = (
+            pipelines.shared_resources
+        )
+        importlib.import_module(
+            f"{project}.middlewares"
+        ).GlobalConcurrencyMiddleware.semaphores = (
+            middlewares.GlobalConcurrencyMiddleware.semaphores
+        )
+
+
+def run_all_projects(
+    project_names=projects,
+    parallel=False,
+    record=False,
+    replay=None,
+    max_requests=None,
+    max_requests_per_domain=None,
+):
+    overrides = {}
+    if max_requests is not None:
+        overrides["GLOBAL_CONCURRENT_REQUESTS"] = max_requests
+    if max_requests_per_domain is not None:
+        overrides["GLOBAL_CONCURRENT_REQUESTS_PER_DOMAIN"] = max_requests_per_domain
+    if parallel:
+        # Spiders running at once share one log file, see parallel_log_path
+        overrides["LOG_FILE"] = parallel_log_path()
+        overrides["LOG_FILE_APPEND"] = True
+        print(f"Logging all spiders to {os.path.abspath(overrides['LOG_FILE'])}")
+
+    crawls = []
+    for project in project_names:
+        settings = load_settings(project, record, replay, overrides)
+        spider_names = SpiderLoader.from_settings(settings).list()
+        crawls.append((CrawlerRunner(settings), spider_names))
+    # One logging setup for the process, from the settings of the first project
+    configure_logging(crawls[0][0].settings)
+    share_resources(project_names)
+
+    @defer.inlineCallbacks
+    def crawl():
+        rows = []
+        if parallel:
+            results = yield defer.DeferredList(
+                [crawl_spiders(runner, names, parallel) for runner, names in crawls]
+            )
+            for success, project_rows in results:
+                if success:
+                    rows.extend(project_rows)
+        else:
+            for runner, names in crawls:
+                rows.extend((yield crawl_spiders(runner, names)))
+        return rows
+
+    result = {}
+
+    def finished(rows):
+        result["rows"] = rows
+        reactor.stop()
+
+    def failed(failure):
+        reactor.stop()
+        return failure
+
+    start = time.perf_counter()
+    crawl().addCallbacks(finished, failed)
+    reactor.run()  # the script will block here until the last crawl call is finished
+    rows = result.get("rows", [])
+    print_timing_summary(rows, time.perf_counter() - start)
+    save_runtimes(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run every spider of both projects in one process"
+    )
+    parser.add_argument(
+        "projects",
+        nargs="*",
+        metavar="project",
+        help="mckinsey or deloitte, all projects by default",
+    )
+    parser.add_argument(
+        "--parallel",
+        action="store_true",
+        help="start all spiders at once instead of one after the other",
+    )
+    parser.add_argument(
+        "--max-requests",
+        type=int,
+        metavar="N",
+        help="requests in flight across all spiders (GLOBAL_CONCURRENT_REQUESTS)",
+    )
+    parser.add_argument(
+        "--max-requests-per-domain",
+        type=int,
+        metavar="N",
+        help="requests in flight per domain across all spiders",
+    )
+    parser.add_argument(
+        "--record", action="store_true", help="record all responses to data/warc/"
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="PATTERN",
+        help='replay the WARC files matching PATTERN, e.g. "data/warc/*.warc.gz"',
+    )
+    args = parser.parse_args()
+    project_names = [f"{project}_scraper" for project in args.projects]
+    for project in project_names:
+        if project not in projects:
+            parser.error(f"unknown project: {project.split('_')[0]}")
+    run_all_projects(
+        project_names or projects,
+        parallel=args.parallel,
+        record=args.record,
+        replay=args.replay,
+        max_requests=args.max_requests,
+        max_requests_per_domain=args.max_requests_per_domain,
+    )